@@ -1,22 +1,98 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_file, session
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_file, session, g, make_response, has_request_context, Response, abort, stream_with_context, send_from_directory
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from flask_session import Session
-from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime, timedelta
-import qrcode
+from flask_session.sessions import RedisSessionInterface
+from werkzeug.security import generate_password_hash, check_password_hash, safe_join
+from werkzeug.middleware.proxy_fix import ProxyFix
+from sqlalchemy import event, exc, inspect, text
+from sqlalchemy.engine import Engine
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+from sqlalchemy.orm import selectinload
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from functools import wraps
+import click
+import csv
+import gzip
+import hashlib
 import io
+import json
+import mimetypes
 import os
+import secrets
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
 import redis
 
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your-secret-key-here')  # Use environment variable in production
 
+# Shared Redis client (sessions, menu cache version)
+redis_client = redis.from_url(os.environ.get('REDIS_URL', 'redis://localhost:6379'))
+
+# Flask-Session 0.5 pickles and rewrites every non-empty session on every
+# request. A session the request didn't change only has its expiry pushed
+# back, so cart updates and menu views don't rewrite it.
+class LazyRedisSessionInterface(RedisSessionInterface):
+    def save_session(self, app, session, response):
+        cookie_name = app.config['SESSION_COOKIE_NAME']
+        if session.modified or not session or cookie_name not in request.cookies:
+            return super().save_session(app, session, response)
+        self.redis.expire(self.key_prefix + session.sid, app.permanent_session_lifetime)
+        response.set_cookie(cookie_name, request.cookies[cookie_name],
+                            expires=self.get_expiration_time(app, session),
+                            httponly=self.get_cookie_httponly(app), domain=self.get_cookie_domain(app),
+                            path=self.get_cookie_path(app), secure=self.get_cookie_secure(app),
+                            samesite=self.get_cookie_samesite(app))
+
 # Session Configuration
 app.config['SESSION_TYPE'] = 'redis'
-app.config['SESSION_REDIS'] = redis.from_url(os.environ.get('REDIS_URL', 'redis://localhost:6379'))
+app.config['SESSION_REDIS'] = redis_client
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(days=1)
 Session(app)
+app.session_interface = LazyRedisSessionInterface(redis_client, app.session_interface.key_prefix,
+                                                  app.session_interface.use_signer, app.session_interface.permanent)
+
+# Order event stream: how long one SSE connection is held before the browser
+# reconnects. Keep it under the gunicorn worker timeout for sync workers.
+app.config['ORDER_EVENTS_MAX_SECONDS'] = int(os.environ.get('ORDER_EVENTS_MAX_SECONDS', 25))
+
+# Order intake: 'sync' commits each order in the request; 'queue' validates,
+# appends it to a Redis stream and returns 202 while `flask order-intake-worker`
+# commits queued orders in batches
+app.config['ORDER_INTAKE_MODE'] = os.environ.get('ORDER_INTAKE_MODE', 'sync')
+
+# Requests slower than this (seconds) are logged with their SQL query count
+app.config['SLOW_REQUEST_SECONDS'] = float(os.environ.get('SLOW_REQUEST_SECONDS', 0.5))
+# Optional bearer token required to scrape /metrics
+app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+
+# Token-bucket budgets for the public endpoints, as 'requests/seconds'.
+# An empty value turns that bucket off; RATE_LIMITS=off disables them all.
+# Keep per-table budgets above per-IP ones so a single client can't use
+# up a table's budget on its own.
+app.config['RATE_LIMIT_ENABLED'] = os.environ.get('RATE_LIMITS', 'on') != 'off'
+app.config['RATE_LIMIT_PLACE_ORDER_PER_IP'] = os.environ.get('RATE_LIMIT_PLACE_ORDER_PER_IP', '20/60')
+app.config['RATE_LIMIT_QR_MENU_PER_IP'] = os.environ.get('RATE_LIMIT_QR_MENU_PER_IP', '60/60')
+app.config['RATE_LIMIT_QR_MENU_PER_TABLE'] = os.environ.get('RATE_LIMIT_QR_MENU_PER_TABLE', '120/60')
+app.config['RATE_LIMIT_GENERATE_QR_PER_IP'] = os.environ.get('RATE_LIMIT_GENERATE_QR_PER_IP', '30/60')
+app.config['RATE_LIMIT_GENERATE_QR_PER_TABLE'] = os.environ.get('RATE_LIMIT_GENERATE_QR_PER_TABLE', '60/60')
+
+# Table QR codes point at PUBLIC_BASE_URL (not the request's Host header) and
+# /generate_qr only serves tables 1..TABLE_COUNT
+app.config['PUBLIC_BASE_URL'] = os.environ.get('PUBLIC_BASE_URL')
+app.config['TABLE_COUNT'] = int(os.environ.get('TABLE_COUNT', 50))
 
 # Database Configuration
 def get_database_url():
@@ -31,7 +107,60 @@ def get_database_url():
     
     return database_url
 
+# Engine tuning per backend. DB_TUNING=off keeps SQLAlchemy's defaults (used
+# by benchmarks/bench_concurrent_writes.py as the baseline).
+DB_TUNING = os.environ.get('DB_TUNING', 'on') != 'off'
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 10000))
+DB_GEVENT_POOL_MAX = int(os.environ.get('DB_GEVENT_POOL_MAX', 10))
+
+def get_engine_options(database_url):
+    if not DB_TUNING:
+        return {}
+
+    if database_url.startswith('sqlite'):
+        # Connections are cheap and local; wait for the write lock instead of
+        # failing straight away with "database is locked"
+        return {'connect_args': {'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000}}
+
+    # One connection per request thread in a worker, a little overflow for
+    # the SSE and intake paths, and no stale connections after idle periods.
+    # A gevent worker runs up to worker_connections requests at once on one
+    # thread, so it gets a bigger (capped) pool instead.
+    if os.environ.get('GUNICORN_WORKER_CLASS') == 'gevent':
+        default_pool_size = min(int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000)), DB_GEVENT_POOL_MAX)
+    else:
+        default_pool_size = int(os.environ.get('GUNICORN_THREADS', 5))
+    pool_size = int(os.environ.get('DB_POOL_SIZE', default_pool_size))
+    return {
+        'pool_size': pool_size,
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', max(2, pool_size // 2))),
+        'pool_timeout': 10,
+        'pool_recycle': 1800,
+        'pool_pre_ping': True,
+    }
+
+@event.listens_for(Engine, 'connect')
+def _apply_connection_settings(dbapi_connection, connection_record):
+    if not DB_TUNING:
+        return
+
+    cursor = dbapi_connection.cursor()
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        # WAL lets readers run alongside the single writer; NORMAL sync is
+        # durable across application crashes and much cheaper per commit
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute(f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+    elif type(dbapi_connection).__module__.startswith('psycopg2'):
+        cursor.execute(f'SET statement_timeout = {DB_STATEMENT_TIMEOUT_MS}')
+        cursor.execute(f'SET idle_in_transaction_session_timeout = {DB_STATEMENT_TIMEOUT_MS * 6}')
+        # Keep the SETs out of the pool's first transaction
+        dbapi_connection.commit()
+    cursor.close()
+
 app.config['SQLALCHEMY_DATABASE_URI'] = get_database_url()
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = get_engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
 # Create instance directory for SQLite (local development)
@@ -43,7 +172,24 @@ if os.environ.get('FLASK_ENV') == 'production':
     from flask_talisman import Talisman
     Talisman(app, force_https=True)
 
+# Number of reverse proxies in front of the app (1 on Render), so the client
+# address used for rate limiting is the diner's rather than the proxy's.
+# Production sits behind Render's proxy, so it trusts one hop by default;
+# without it every diner would share the proxy's per-IP bucket.
+TRUSTED_PROXIES = int(os.environ.get('TRUSTED_PROXIES', 1 if os.environ.get('FLASK_ENV') == 'production' else 0))
+if TRUSTED_PROXIES:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES, x_proto=TRUSTED_PROXIES)
+
 db = SQLAlchemy(app)
+
+def reset_connections_after_fork():
+    # Called from gunicorn's post_fork hook: with --preload, sockets opened in
+    # the master would otherwise be shared by every worker. Drop them without
+    # closing, since the master (or a sibling) may still be using them.
+    redis_client.connection_pool.reset()
+    with app.app_context():
+        db.engine.dispose(close=False)
+
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
@@ -65,15 +211,31 @@ class MenuItem(db.Model):
     image_url = db.Column(db.String(200))
     available = db.Column(db.Boolean, default=True)
 
+    __table_args__ = (
+        # Menu pages: available items, optionally narrowed to one category
+        db.Index('ix_menu_item_available_category', 'available', 'category'),
+    )
+
 class Order(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)  # nullable for guest orders
     table_number = db.Column(db.Integer)
     status = db.Column(db.String(20), default='pending')  # pending, confirmed, completed, cancelled
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    intake_token = db.Column(db.String(32), unique=True, index=True)  # set for orders taken through the intake queue
     items = db.relationship('OrderItem', backref='order', lazy=True)
     total_amount = db.Column(db.Float, nullable=False, default=0.0)
 
+    __table_args__ = (
+        # Active orders: status IN (...) ORDER BY id
+        db.Index('ix_order_status_id', 'status', 'id'),
+        # Order history per user, newest first
+        db.Index('ix_order_user_id_created_at', 'user_id', 'created_at', 'id'),
+        # Date-range reports across all orders
+        db.Index('ix_order_created_at', 'created_at', 'id'),
+    )
+
 class OrderItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
@@ -83,87 +245,1461 @@ class OrderItem(db.Model):
     special_instructions = db.Column(db.Text)
     menu_item = db.relationship('MenuItem')
 
+    __table_args__ = (
+        # Loading the items of a set of orders
+        db.Index('ix_order_item_order_id', 'order_id'),
+    )
+
+# Sales rollups, keyed by the day (UTC) the order was placed. Completed orders
+# count towards quantity and revenue; they are maintained incrementally by
+# update_order_status so analytics never scan Order/OrderItem.
+class DailyItemSales(db.Model):
+    day = db.Column(db.Date, primary_key=True)
+    menu_item_id = db.Column(db.Integer, db.ForeignKey('menu_item.id'), primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+
+class DailyCategorySales(db.Model):
+    day = db.Column(db.Date, primary_key=True)
+    category = db.Column(db.String(50), primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+
+class DailyTableSales(db.Model):
+    day = db.Column(db.Date, primary_key=True)
+    table_number = db.Column(db.Integer, primary_key=True)  # 0 for orders without a table
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+    cancelled_orders = db.Column(db.Integer, nullable=False, default=0)
+
+# User Cache
+# Flask-Login already calls load_user at most once per request (the result is
+# kept on flask.g). Across requests, users are cached in Redis for a short
+# while so authenticated API calls don't cost an extra query each; commits
+# that change or delete a User drop its entry.
+USER_CACHE_TTL = 60
+
+class CachedUser(UserMixin):
+    # Read-only stand-in for User, rebuilt from the Redis user cache
+    def __init__(self, id, username, email):
+        self.id = id
+        self.username = username
+        self.email = email
+
+def _user_cache_key(user_id):
+    return f'user:{user_id}'
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    try:
+        user_id = int(user_id)
+    except ValueError:
+        return None
+
+    try:
+        cached = redis_client.get(_user_cache_key(user_id))
+        if cached is not None:
+            return CachedUser(**json.loads(cached))
+    except redis.RedisError:
+        pass
+
+    user = db.session.get(User, user_id)
+    if user is not None:
+        try:
+            redis_client.setex(_user_cache_key(user_id), USER_CACHE_TTL, json.dumps({
+                'id': user.id,
+                'username': user.username,
+                'email': user.email
+            }))
+        except redis.RedisError:
+            pass
+    return user
+
+def invalidate_cached_users(user_ids):
+    try:
+        redis_client.delete(*[_user_cache_key(user_id) for user_id in user_ids])
+    except redis.RedisError as e:
+        print(f"User cache invalidation failed: {str(e)}")
+
+# Staff Access
+# Accounts allowed to change the menu and list every order, by username or
+# email (comma-separated ADMIN_USERS). Nobody is staff until it is set.
+ADMIN_USERS = {name.strip().lower() for name in os.environ.get('ADMIN_USERS', '').split(',') if name.strip()}
+
+def is_admin(user):
+    return (user.is_authenticated
+            and (user.username.lower() in ADMIN_USERS or user.email.lower() in ADMIN_USERS))
+
+def admin_required(view):
+    @wraps(view)
+    @login_required
+    def wrapper(*args, **kwargs):
+        if not is_admin(current_user):
+            return jsonify({'error': 'Staff access required'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+# Menu Catalog Cache
+# Each worker keeps the grouped menu in memory. A version counter in Redis is
+# bumped whenever a MenuItem is committed, which invalidates every worker at once.
+MENU_VERSION_KEY = 'menu:version'
+_menu_cache = {'version': None, 'menu': None}
+
+def _fetch_menu_version():
+    try:
+        version = redis_client.get(MENU_VERSION_KEY)
+        if version is None:
+            # Seed from the clock so a flushed Redis never reuses an old version
+            redis_client.set(MENU_VERSION_KEY, int(time.time() * 1000), nx=True)
+            version = redis_client.get(MENU_VERSION_KEY)
+        return version.decode()
+    except redis.RedisError:
+        return None
+
+def get_menu_version():
+    # Read Redis at most once per request (ETag check and catalog lookup)
+    if not has_request_context():
+        return _fetch_menu_version()
+    if 'menu_version' not in g:
+        g.menu_version = _fetch_menu_version()
+    return g.menu_version
+
+def bump_menu_version():
+    try:
+        redis_client.incr(MENU_VERSION_KEY)
+    except redis.RedisError as e:
+        print(f"Menu version bump failed: {str(e)}")
+    _menu_cache['version'] = None
+    if has_request_context():
+        g.pop('menu_version', None)
+
+def load_menu_catalog():
+    menu_items = MenuItem.query.filter_by(available=True).order_by(MenuItem.category, MenuItem.id).all()
+    categories = sorted(set(item.category for item in menu_items))
+    menu_by_category = {category: [] for category in categories}
+    for item in menu_items:
+        # Plain dicts so cached entries never touch a (closed) session
+        menu_by_category[item.category].append({
+            'id': item.id,
+            'name': item.name,
+            'description': item.description,
+            'price': item.price,
+            'category': item.category,
+            'image_url': item.image_url,
+            'image': get_menu_image(item.image_url),
+            'available': item.available
+        })
+    return categories, menu_by_category
+
+def _load_menu():
+    catalog = load_menu_catalog()
+    index = {entry['id']: entry for entries in catalog[1].values() for entry in entries}
+    return catalog, index
+
+def _current_menu():
+    version = get_menu_version()
+    if version is None:
+        # Redis unavailable: no way to know if the cache is stale
+        return _load_menu()
+
+    if _menu_cache['version'] != version:
+        _menu_cache['menu'] = _load_menu()
+        _menu_cache['version'] = version
+    return _menu_cache['menu']
+
+def get_menu_catalog():
+    return _current_menu()[0]
+
+def get_menu_index():
+    # Available menu items by id, from the same cache as the menu pages
+    return _current_menu()[1]
+
+# Static Assets
+# `flask build-assets` copies static/ into static/dist under content-hashed
+# names (css/style.1a2b3c4d5e.css) with precompressed .gz/.br siblings and a
+# manifest.json. Templates resolve static URLs through the manifest, and the
+# hashed files are served with a one-year immutable Cache-Control, picking
+# the precompressed variant the browser accepts.
+ASSET_DIST_DIR = os.path.join(app.static_folder, 'dist')
+ASSET_MANIFEST_PATH = os.path.join(ASSET_DIST_DIR, 'manifest.json')
+ASSET_MAX_AGE = 365 * 24 * 3600
+COMPRESSIBLE_ASSETS = {'.css', '.js', '.svg', '.html', '.json', '.txt'}
+ASSET_ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+def compress_bytes(data, encoding, fast=False):
+    # fast=True for per-request compression; built and cached bodies get the best ratio
+    if encoding == 'br':
+        return brotli.compress(data, quality=4 if fast else 11)
+    return gzip.compress(data, compresslevel=6 if fast else 9, mtime=0)
+
+def build_assets():
+    shutil.rmtree(ASSET_DIST_DIR, ignore_errors=True)
+    encodings = [(encoding, suffix) for encoding, suffix in ASSET_ENCODINGS if encoding != 'br' or brotli]
+    manifest = {}
+    for root, dirs, files in os.walk(app.static_folder):
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != ASSET_DIST_DIR]
+        for name in files:
+            source = os.path.join(root, name)
+            filename = os.path.relpath(source, app.static_folder).replace(os.sep, '/')
+            with open(source, 'rb') as f:
+                data = f.read()
+
+            stem, ext = os.path.splitext(filename)
+            hashed = f'{stem}.{hashlib.sha256(data).hexdigest()[:10]}{ext}'
+            target = os.path.join(ASSET_DIST_DIR, hashed)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'wb') as f:
+                f.write(data)
+            if ext.lower() in COMPRESSIBLE_ASSETS:
+                for encoding, suffix in encodings:
+                    compressed = compress_bytes(data, encoding)
+                    if len(compressed) < len(data):
+                        with open(target + suffix, 'wb') as f:
+                            f.write(compressed)
+            manifest[filename] = hashed
+
+    with open(ASSET_MANIFEST_PATH, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+def load_asset_manifest():
+    try:
+        with open(ASSET_MANIFEST_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        # No build yet (local development): serve static/ as is
+        return {}
+
+asset_manifest = load_asset_manifest()
+
+def asset_url_for(endpoint, **values):
+    if endpoint == 'static' and values.get('filename') in asset_manifest:
+        values['filename'] = asset_manifest[values['filename']]
+        endpoint = 'static_asset'
+    return url_for(endpoint, **values)
+
+app.jinja_env.globals['url_for'] = asset_url_for
+
+# Response Compression
+# Text responses of at least COMPRESS_MIN_BYTES are sent gzip or brotli
+# encoded when the browser accepts it. Menu pages keep their compressed
+# bodies in Redis under their ETag (which carries the menu version), so a
+# page is rendered and compressed once per menu change, not per request.
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', 500))
+COMPRESSIBLE_MIMETYPES = {'text/html', 'text/css', 'text/csv', 'text/plain', 'text/javascript',
+                          'application/javascript', 'application/json', 'image/svg+xml'}
+MENU_BODY_TTL = 24 * 3600
+
+def negotiate_encoding():
+    for encoding, _ in ASSET_ENCODINGS:
+        if (encoding != 'br' or brotli) and request.accept_encodings.quality(encoding) > 0:
+            return encoding
+    return None
+
+def _mark_encoded(response, encoding):
+    response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    # Each encoding is a different representation, so no strong validator
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+
+@app.after_request
+def _compress_response(response):
+    if (response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or not 200 <= response.status_code < 300 or response.status_code in (204, 206)
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_BYTES:
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding()
+    if encoding:
+        response.set_data(compress_bytes(data, encoding, fast=True))
+        _mark_encoded(response, encoding)
+    return response
+
+def _compressed_menu_response(etag, encoding, render):
+    key = f'menu:body:{etag}:{encoding}'
+    try:
+        body = redis_client.get(key)
+    except redis.RedisError as e:
+        print(f"Menu body cache read failed: {str(e)}")
+        body = None
+
+    if body is None:
+        body = compress_bytes(render().encode(), encoding)
+        try:
+            redis_client.set(key, body, ex=MENU_BODY_TTL)
+        except redis.RedisError as e:
+            print(f"Menu body cache write failed: {str(e)}")
+
+    response = app.response_class(body, mimetype='text/html')
+    _mark_encoded(response, encoding)
+    return response
+
+# Conditional Menu Responses
+# Menu pages carry a strong ETag built from the menu version, the templates
+# and whoever is viewing, so an unchanged menu is answered with a 304 before
+# touching the database or rendering anything.
+MENU_TEMPLATES = ('base.html', 'macros.html', 'menu.html', 'qr_menu.html')
+
+def _hash_menu_templates():
+    digest = hashlib.sha1()
+    for name in MENU_TEMPLATES:
+        with open(os.path.join(app.root_path, 'templates', name), 'rb') as f:
+            digest.update(f.read())
+    # Static URLs in the pages change with each asset build
+    digest.update(json.dumps(asset_manifest, sort_keys=True).encode())
+    return digest.hexdigest()[:12]
+
+MENU_TEMPLATE_HASH = _hash_menu_templates()
+
+def menu_etag(*parts):
+    version = get_menu_version()
+    # Pending flash messages and cart notices are rendered into the page, so never reuse it
+    if version is None or session.get('_flashes') or request.args.get('notice'):
+        return None
+    viewer = session.get('_user_id', 'anon')
+    key = ':'.join(str(part) for part in (MENU_TEMPLATE_HASH, version, viewer, *parts))
+    return hashlib.sha1(key.encode()).hexdigest()
+
+def conditional_menu_response(etag, render):
+    encoding = negotiate_encoding()
+    if etag is not None and request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+    elif etag is not None and encoding:
+        response = _compressed_menu_response(etag, encoding, render)
+    else:
+        response = make_response(render())
+
+    if etag is None:
+        response.cache_control.no_store = True
+        return response
+
+    response.set_etag(etag, weak=encoding is not None)
+    # Always revalidate (a menu edit must show up on the next scan), but let
+    # phones and shared caches keep the body and reuse it on a 304
+    if session.get('_user_id'):
+        response.cache_control.private = True
+    else:
+        response.cache_control.public = True
+    response.cache_control.no_cache = True
+    response.vary.add('Cookie')
+    response.vary.add('Accept-Encoding')
+    return response
+
+# Order Event Feed
+# Order changes are published on a Redis channel so that every gunicorn
+# worker can push them to the admin dashboards it is streaming to.
+ORDER_EVENTS_CHANNEL = 'orders:events'
+
+def publish_order_event(event_type, payload):
+    try:
+        redis_client.publish(ORDER_EVENTS_CHANNEL, json.dumps({'type': event_type, 'order': payload}))
+    except redis.RedisError as e:
+        print(f"Order event publish failed: {str(e)}")
+
+def order_created_payload(order, lines):
+    # lines are (name, quantity, price). Build it before commit, which
+    # expires the order and would make reading it go back to the database.
+    return {
+        'id': order.id,
+        'table_number': order.table_number,
+        'status': order.status,
+        'total_amount': order.total_amount,
+        'items': [{
+            'name': name,
+            'quantity': quantity,
+            'price': price
+        } for name, quantity, price in lines]
+    }
+
+def stream_order_events(max_seconds):
+    pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(ORDER_EVENTS_CHANNEL)
+    deadline = time.monotonic() + max_seconds
+    try:
+        yield 'retry: 2000\n\n'
+        while time.monotonic() < deadline:
+            message = pubsub.get_message(timeout=min(15, max(deadline - time.monotonic(), 0)))
+            if message is None:
+                # Comment line keeps proxies from closing an idle connection
+                yield ': keepalive\n\n'
+                continue
+            event_data = json.loads(message['data'])
+            yield f"event: {event_data['type']}\ndata: {json.dumps(event_data['order'])}\n\n"
+    finally:
+        pubsub.close()
+
+# Cart Storage
+# Each cart is a Redis hash of menu item id -> quantity, named by its own
+# cookie, so adding or removing an item is one atomic hash operation and
+# never rewrites the session. Names and prices come from the menu cache.
+CART_COOKIE = 'cart_id'
+CART_TTL = app.config['PERMANENT_SESSION_LIFETIME']
+
+def _cart_key(cart_id):
+    return f'cart:{cart_id}'
+
+def get_cart_id(create=False):
+    if 'cart_id' not in g:
+        cart_id = request.cookies.get(CART_COOKIE)
+        g.cart_id = cart_id if cart_id and len(cart_id) <= 64 else None
+    if g.cart_id is None and create:
+        g.cart_id = secrets.token_urlsafe(24)
+        g.set_cart_cookie = True
+    return g.cart_id
+
+def cart_add(item_id, quantity):
+    key = _cart_key(get_cart_id(create=True))
+    pipe = redis_client.pipeline()
+    pipe.hincrby(key, item_id, quantity)
+    pipe.expire(key, CART_TTL)
+    pipe.execute()
+
+def cart_remove(item_id):
+    cart_id = get_cart_id()
+    if cart_id:
+        redis_client.hdel(_cart_key(cart_id), item_id)
+
+def cart_clear():
+    cart_id = get_cart_id()
+    if cart_id:
+        redis_client.delete(_cart_key(cart_id))
+
+def get_cart_items():
+    cart_id = get_cart_id()
+    if not cart_id:
+        return []
+
+    menu_index = get_menu_index()
+    items = []
+    for item_id, quantity in redis_client.hgetall(_cart_key(cart_id)).items():
+        entry = menu_index.get(int(item_id))
+        # Items taken off the menu since they were added are dropped
+        if entry is None or int(quantity) < 1:
+            continue
+        items.append({
+            'id': entry['id'],
+            'name': entry['name'],
+            'price': entry['price'],
+            'quantity': int(quantity)
+        })
+    return sorted(items, key=lambda item: item['id'])
+
+@app.after_request
+def _set_cart_cookie(response):
+    if g.pop('set_cart_cookie', False):
+        response.set_cookie(
+            CART_COOKIE, g.cart_id,
+            max_age=int(CART_TTL.total_seconds()),
+            httponly=True,
+            samesite='Lax',
+            secure=os.environ.get('FLASK_ENV') == 'production'
+        )
+    return response
+
+# Cart routes report back through a ?notice= code on the redirect rather than
+# flash(), which would write the session on every cart change
+CART_NOTICES = {
+    'added': '{item} added to cart!',
+    'invalid_quantity': 'Invalid quantity',
+    'removed': 'Item removed from cart',
+    'empty': 'Your cart is empty',
+    'placed': 'Order placed successfully!',
+    'order_failed': 'Error placing order. Please try again.',
+}
+
+@app.context_processor
+def _inject_cart_notice():
+    if not has_request_context():
+        return {}
+    message = CART_NOTICES.get(request.args.get('notice'))
+    if message and '{item}' in message:
+        entry = get_menu_index().get(request.args.get('item', type=int))
+        message = message.format(item=entry['name'] if entry else 'Item')
+    return {'cart_notice': message}
+
+# Idempotent Requests
+# Clients send an Idempotency-Key header with a write and reuse it on retries.
+# The first request claims the key in Redis; once it finishes, its response
+# is stored under the key and replayed to retries without touching the
+# database. A duplicate that arrives while the first is still running waits
+# briefly for its result, then gets 409 and retries.
+IDEMPOTENCY_TTL = int(os.environ.get('IDEMPOTENCY_TTL_SECONDS', 3600))
+IDEMPOTENCY_LOCK_SECONDS = 30
+IDEMPOTENCY_WAIT_SECONDS = 2
+
+def _idempotency_key(key):
+    digest = hashlib.sha256(f'{request.endpoint}:{key}'.encode()).hexdigest()
+    return f'idempotency:{digest}'
+
+def _replay_response(record):
+    response = app.response_class(record['body'], status=record['status'], mimetype=record['mimetype'])
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+def idempotent(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if key is None:
+            return view(*args, **kwargs)
+        if not key or len(key) > 255:
+            return jsonify({'error': 'Invalid Idempotency-Key'}), 400
+
+        redis_key = _idempotency_key(key)
+        fingerprint = hashlib.sha256(request.get_data()).hexdigest()
+        try:
+            claimed = redis_client.set(redis_key, json.dumps({'fingerprint': fingerprint}),
+                                       nx=True, ex=IDEMPOTENCY_LOCK_SECONDS)
+        except redis.RedisError as e:
+            print(f"Idempotency check failed: {str(e)}")
+            return view(*args, **kwargs)
+
+        if not claimed:
+            deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+            while True:
+                try:
+                    raw = redis_client.get(redis_key)
+                except redis.RedisError as e:
+                    # The first request may still be running, so don't run
+                    # this one too; the client retries with the same key
+                    print(f"Idempotency check failed: {str(e)}")
+                    raw = None
+                record = json.loads(raw) if raw else None
+                if record and record['fingerprint'] != fingerprint:
+                    return jsonify({'error': 'Idempotency-Key was used with a different request'}), 422
+                if record and 'status' in record:
+                    return _replay_response(record)
+                if record is None or time.monotonic() >= deadline:
+                    response = jsonify({'error': 'A request with this Idempotency-Key is in progress'})
+                    response.headers['Retry-After'] = '1'
+                    return response, 409
+                time.sleep(0.05)
+
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            try:
+                redis_client.delete(redis_key)
+            except redis.RedisError as e:
+                print(f"Releasing Idempotency-Key failed: {str(e)}")
+            raise
+
+        try:
+            if response.status_code >= 500:
+                # Let a retry run the request again
+                redis_client.delete(redis_key)
+            else:
+                redis_client.set(redis_key, json.dumps({
+                    'fingerprint': fingerprint,
+                    'status': response.status_code,
+                    'mimetype': response.mimetype,
+                    'body': response.get_data(as_text=True)
+                }), ex=IDEMPOTENCY_TTL)
+        except redis.RedisError as e:
+            print(f"Storing idempotent response failed: {str(e)}")
+        return response
+    return wrapper
+
+# Rate Limiting
+# Token buckets in Redis, one per client IP and, for routes with the table
+# in the URL, one per table. A bucket holds up to N tokens and refills at N
+# per S seconds, so short bursts pass while sustained abuse gets 429. All of
+# a request's buckets are checked and charged in one script, atomically, so
+# a client out of IP budget can't drain a table's bucket either.
+RATE_LIMIT_SCRIPT = redis_client.register_script("""
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local buckets = {}
+local retry_after = 0
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2 - 1])
+    local rate = capacity / tonumber(ARGV[i * 2])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local elapsed = math.max(0, now - (tonumber(state[2]) or now))
+    tokens = math.min(capacity, tokens + elapsed * rate)
+    if tokens < 1 then
+        retry_after = math.max(retry_after, (1 - tokens) / rate)
+    end
+    buckets[i] = {tokens, math.ceil(capacity / rate)}
+end
+for i, key in ipairs(KEYS) do
+    local tokens = buckets[i][1]
+    if retry_after == 0 then
+        tokens = tokens - 1
+    end
+    redis.call('HSET', key, 'tokens', tostring(tokens), 'ts', tostring(now))
+    redis.call('EXPIRE', key, buckets[i][2])
+end
+return tostring(retry_after)
+""")
+
+def _parse_rate_budget(budget):
+    capacity, _, seconds = budget.partition('/')
+    return int(capacity), float(seconds or 1)
+
+def rate_limited(name):
+    # Budgets come from RATE_LIMIT_<NAME>_PER_IP / _PER_TABLE ('N/S' strings)
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not app.config['RATE_LIMIT_ENABLED']:
+                return view(*args, **kwargs)
+
+            keys, budgets = [], []
+            per_ip = app.config.get(f'RATE_LIMIT_{name.upper()}_PER_IP')
+            if per_ip:
+                keys.append(f'ratelimit:{name}:ip:{request.remote_addr}')
+                budgets.extend(_parse_rate_budget(per_ip))
+            per_table = app.config.get(f'RATE_LIMIT_{name.upper()}_PER_TABLE')
+            # Only the route's own table: a number from the request body could
+            # be any table, so one client could spend another table's budget
+            table_number = kwargs.get('table_number')
+            if per_table and table_number is not None:
+                keys.append(f'ratelimit:{name}:table:{table_number}')
+                budgets.extend(_parse_rate_budget(per_table))
+
+            try:
+                retry_after = float(RATE_LIMIT_SCRIPT(keys=keys, args=budgets)) if keys else 0
+            except redis.RedisError as e:
+                # Fail open: a Redis outage shouldn't stop diners ordering
+                print(f"Rate limit check failed: {str(e)}")
+                retry_after = 0
+
+            if retry_after > 0:
+                response = jsonify({'error': 'Too many requests, please slow down'})
+                response.headers['Retry-After'] = str(max(1, int(retry_after + 0.999)))
+                return response, 429
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+# Request Metrics
+# Per-endpoint latency and per-request SQL counts, exposed in Prometheus text
+# format at /metrics. Under gunicorn, set PROMETHEUS_MULTIPROC_DIR so every
+# worker's samples are aggregated.
+REQUEST_LATENCY = Histogram(
+    'jch_request_duration_seconds', 'Request latency by endpoint',
+    ['endpoint', 'method'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+REQUESTS = Counter('jch_requests_total', 'Requests by endpoint and status', ['endpoint', 'method', 'status'])
+REQUEST_QUERIES = Histogram(
+    'jch_request_sql_queries', 'SQL statements executed per request',
+    ['endpoint'],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+)
+REQUEST_QUERY_SECONDS = Histogram(
+    'jch_request_sql_seconds', 'Total SQL time per request',
+    ['endpoint'],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the statement's own execution context, so a statement that
+    # fails (no after_cursor_execute) leaves nothing behind on the connection
+    context._query_started = time.perf_counter()
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _record_query(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._query_started
+    if has_request_context() and 'sql_queries' in g:
+        g.sql_queries += 1
+        g.sql_seconds += elapsed
+
+@app.before_request
+def _start_request_metrics():
+    g.request_started = time.perf_counter()
+    g.sql_queries = 0
+    g.sql_seconds = 0.0
+
+@app.after_request
+def _record_request_metrics(response):
+    if 'request_started' not in g:
+        return response
+    elapsed = time.perf_counter() - g.request_started
+    # Unmatched URLs share one label to keep the series count bounded
+    endpoint = request.endpoint or 'unmatched'
+    REQUEST_LATENCY.labels(endpoint, request.method).observe(elapsed)
+    REQUESTS.labels(endpoint, request.method, response.status_code).inc()
+    REQUEST_QUERIES.labels(endpoint).observe(g.sql_queries)
+    REQUEST_QUERY_SECONDS.labels(endpoint).observe(g.sql_seconds)
+
+    if elapsed > app.config['SLOW_REQUEST_SECONDS']:
+        app.logger.warning(
+            'Slow request %s %s: %.0f ms, %d queries, %.0f ms in SQL',
+            request.method, request.path, elapsed * 1000, g.sql_queries, g.sql_seconds * 1000
+        )
+    return response
+
+def render_metrics():
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest()
+
+@event.listens_for(db.session, 'before_flush')
+def _track_cached_changes(session, flush_context, instances):
+    changed = (*session.dirty, *session.deleted)
+    if any(isinstance(obj, MenuItem) for obj in (*session.new, *changed)):
+        session.info['menu_changed'] = True
+    user_ids = {obj.id for obj in changed if isinstance(obj, User)}
+    if user_ids:
+        session.info.setdefault('users_changed', set()).update(user_ids)
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_caches(session):
+    if session.info.pop('menu_changed', False):
+        bump_menu_version()
+    user_ids = session.info.pop('users_changed', None)
+    if user_ids:
+        invalidate_cached_users(user_ids)
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_cached_changes(session):
+    session.info.pop('menu_changed', None)
+    session.info.pop('users_changed', None)
+
+# Sales Rollups
+def _upsert_increments(connection, model, keys, rows):
+    # INSERT ... ON CONFLICT DO UPDATE SET col = col + excluded.col
+    if not rows:
+        return
+    if connection.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    statement = insert(model).values(rows)
+    columns = [column for column in rows[0] if column not in keys]
+    statement = statement.on_conflict_do_update(
+        index_elements=keys,
+        set_={column: getattr(model, column) + statement.excluded[column] for column in columns}
+    )
+    connection.execute(statement)
+
+def _add_to_rollups(connection, day, table_number, lines, sign, cancelled):
+    # lines: (menu_item_id, category, quantity, price) for one order
+    items, categories = {}, {}
+    for menu_item_id, category, quantity, price in lines:
+        item = items.setdefault(menu_item_id, [0, 0.0])
+        item[0] += quantity * sign
+        item[1] += quantity * price * sign
+        total = categories.setdefault(category, [0, 0.0])
+        total[0] += quantity * sign
+        total[1] += quantity * price * sign
+
+    if sign:
+        _upsert_increments(connection, DailyItemSales, ['day', 'menu_item_id'], [
+            {'day': day, 'menu_item_id': menu_item_id, 'quantity': quantity, 'revenue': revenue}
+            for menu_item_id, (quantity, revenue) in items.items()
+        ])
+        _upsert_increments(connection, DailyCategorySales, ['day', 'category'], [
+            {'day': day, 'category': category, 'quantity': quantity, 'revenue': revenue}
+            for category, (quantity, revenue) in categories.items()
+        ])
+    _upsert_increments(connection, DailyTableSales, ['day', 'table_number'], [{
+        'day': day,
+        'table_number': table_number or 0,
+        'orders': sign,
+        'revenue': sum(revenue for _, revenue in items.values()),
+        'cancelled_orders': cancelled
+    }])
+
+def apply_status_to_rollups(order, previous_status, new_status):
+    # Counts move in or out of the rollups as an order enters or leaves
+    # 'completed' (and 'cancelled'), in the same transaction as the change
+    sign = (new_status == 'completed') - (previous_status == 'completed')
+    cancelled = (new_status == 'cancelled') - (previous_status == 'cancelled')
+    if not sign and not cancelled:
+        return
+
+    lines = (db.session.query(OrderItem.menu_item_id, MenuItem.category, OrderItem.quantity, OrderItem.price_at_time)
+             .join(MenuItem, OrderItem.menu_item_id == MenuItem.id)
+             .filter(OrderItem.order_id == order.id)
+             .all())
+    _add_to_rollups(db.session.connection(), order.created_at.date(), order.table_number, lines, sign, cancelled)
+
+def rebuild_sales_rollups(connection):
+    # Full recompute from order history (first migration, or after a repair),
+    # aggregated by the database with one INSERT ... SELECT per rollup table
+    if connection.dialect.name == 'postgresql':
+        # Years of orders can outlast the pool's default statement_timeout
+        connection.exec_driver_sql('SET LOCAL statement_timeout = 0')
+    for model in (DailyItemSales, DailyCategorySales, DailyTableSales):
+        connection.execute(db.delete(model))
+
+    if connection.dialect.name == 'sqlite':
+        day = db.func.date(Order.created_at)
+    else:
+        day = db.cast(Order.created_at, db.Date)
+    completed = Order.status == 'completed'
+    revenue = OrderItem.quantity * OrderItem.price_at_time
+    lines = (db.select()
+             .select_from(Order)
+             .join(OrderItem, OrderItem.order_id == Order.id)
+             .join(MenuItem, OrderItem.menu_item_id == MenuItem.id))
+
+    for model, key in ((DailyItemSales, OrderItem.menu_item_id), (DailyCategorySales, MenuItem.category)):
+        connection.execute(db.insert(model).from_select(
+            ['day', key.key, 'quantity', 'revenue'],
+            lines.add_columns(day, key, db.func.sum(OrderItem.quantity), db.func.sum(revenue))
+                 .where(completed)
+                 .group_by(day, key)
+        ))
+
+    table_number = db.func.coalesce(Order.table_number, 0)
+    connection.execute(db.insert(DailyTableSales).from_select(
+        ['day', 'table_number', 'orders', 'revenue', 'cancelled_orders'],
+        lines.add_columns(day, table_number,
+                          db.func.count(db.distinct(db.case((completed, Order.id)))),
+                          db.func.coalesce(db.func.sum(db.case((completed, revenue), else_=0.0)), 0.0),
+                          db.func.count(db.distinct(db.case((Order.status == 'cancelled', Order.id)))))
+             .where(Order.status.in_(['completed', 'cancelled']))
+             .group_by(day, table_number)
+    ))
+
+# Order Intake Queue
+# In 'queue' mode /api/place_order only validates the order and appends it to
+# a Redis stream. The intake worker reads the stream through a consumer group
+# and commits orders in batches. Each order carries a token, which is stored
+# on the Order row, so a batch redelivered after a crash is not inserted twice.
+# Orders that can never be saved are moved to a dead-letter stream; during a
+# database outage entries stay pending in the group until it is back.
+ORDER_INTAKE_STREAM = 'orders:intake'
+ORDER_INTAKE_GROUP = 'order-writers'
+ORDER_INTAKE_BATCH_SIZE = 100
+ORDER_INTAKE_CLAIM_IDLE_MS = 60000
+ORDER_INTAKE_MAX_ATTEMPTS = 5
+ORDER_INTAKE_MAX_BACKOFF = 30
+ORDER_INTAKE_ATTEMPTS = 'orders:intake:attempts'
+ORDER_INTAKE_DEAD_STREAM = 'orders:intake:dead'
+ORDER_TOKEN_TTL = 86400
+
+def _order_token_key(token):
+    return f'order_token:{token}'
+
+def enqueue_order(table_number, lines, menu_index):
+    token = uuid.uuid4().hex
+    order = {
+        'token': token,
+        'table_number': table_number,
+        'items': [{
+            'menu_item_id': item_id,
+            'name': menu_index[item_id]['name'],
+            'quantity': quantity,
+            'price': menu_index[item_id]['price'],
+            'special_instructions': special_instructions
+        } for item_id, quantity, special_instructions in lines]
+    }
+    pipe = redis_client.pipeline()
+    pipe.set(_order_token_key(token), 'queued', ex=ORDER_TOKEN_TTL)
+    pipe.xadd(ORDER_INTAKE_STREAM, {'order': json.dumps(order)})
+    pipe.execute()
+    return token
+
+def persist_queued_orders(queued):
+    # Returns {token: order_id} and the order_created events to publish
+    tokens = [order['token'] for order in queued]
+    order_ids = dict(db.session.query(Order.intake_token, Order.id).filter(Order.intake_token.in_(tokens)))
+    queued = [order for order in queued if order['token'] not in order_ids]
+    if not queued:
+        return order_ids, []
+
+    orders = [Order(
+        table_number=order['table_number'],
+        status='pending',
+        intake_token=order['token'],
+        total_amount=sum(item['price'] * item['quantity'] for item in order['items'])
+    ) for order in queued]
+    db.session.add_all(orders)
+    db.session.flush()
+    db.session.execute(db.insert(OrderItem), [{
+        'order_id': order.id,
+        'menu_item_id': item['menu_item_id'],
+        'quantity': item['quantity'],
+        'price_at_time': item['price'],
+        'special_instructions': item['special_instructions']
+    } for order, queued_order in zip(orders, queued) for item in queued_order['items']])
+
+    events = [order_created_payload(order, [(item['name'], item['quantity'], item['price'])
+                                            for item in queued_order['items']])
+              for order, queued_order in zip(orders, queued)]
+    order_ids.update({order.intake_token: order.id for order in orders})
+    db.session.commit()
+    return order_ids, events
+
+def _is_transient_db_error(error):
+    # The database is down or the connection dropped; the same order will
+    # go through once it is back
+    if isinstance(error, (exc.OperationalError, exc.InterfaceError, exc.DisconnectionError, exc.TimeoutError)):
+        return True
+    return isinstance(error, exc.DBAPIError) and error.connection_invalidated
+
+def _is_permanent_intake_error(error):
+    # A malformed order or one the database rejects fails the same way on
+    # every retry
+    return isinstance(error, (exc.IntegrityError, exc.DataError, KeyError, TypeError, ValueError))
+
+def process_intake_entries(entries):
+    # Returns False if the database was unreachable. Entries that weren't
+    # saved are left pending (not marked failed) and are read again later.
+    queued, finished, dead = [], [], []
+    for entry_id, fields in entries:
+        # Claimed entries that were deleted in the meantime come back empty
+        if not fields or b'order' not in fields:
+            finished.append(entry_id)
+            continue
+        try:
+            queued.append((entry_id, fields[b'order'], json.loads(fields[b'order'])))
+        except ValueError as e:
+            dead.append((entry_id, fields[b'order'], None, str(e)))
+
+    order_ids, events, retry = {}, [], []
+    reachable = True
+    try:
+        order_ids, events = persist_queued_orders([order for _, _, order in queued])
+        finished.extend(entry_id for entry_id, _, _ in queued)
+    except Exception as e:
+        db.session.rollback()
+        if _is_transient_db_error(e):
+            print(f"Order intake batch failed, leaving it pending: {str(e)}")
+            reachable = False
+            queued = []
+        else:
+            print(f"Order intake batch failed, retrying one by one: {str(e)}")
+        for entry_id, raw, order in queued:
+            try:
+                ids, order_events = persist_queued_orders([order])
+                order_ids.update(ids)
+                events.extend(order_events)
+                finished.append(entry_id)
+            except Exception as e:
+                db.session.rollback()
+                print(f"Order intake failed for entry {entry_id}: {str(e)}")
+                if _is_transient_db_error(e):
+                    reachable = False
+                    break
+                if _is_permanent_intake_error(e):
+                    dead.append((entry_id, raw, order, str(e)))
+                else:
+                    retry.append((entry_id, raw, order, str(e)))
+
+    # Unexpected errors are retried a few times before the entry is given up on
+    if retry:
+        pipe = redis_client.pipeline()
+        for entry_id, _, _, _ in retry:
+            pipe.hincrby(ORDER_INTAKE_ATTEMPTS, entry_id, 1)
+        for attempts, entry in zip(pipe.execute(), retry):
+            if attempts >= ORDER_INTAKE_MAX_ATTEMPTS:
+                dead.append(entry)
+
+    pipe = redis_client.pipeline()
+    for token, order_id in order_ids.items():
+        pipe.set(_order_token_key(token), order_id, ex=ORDER_TOKEN_TTL)
+    for entry_id, raw, order, error in dead:
+        pipe.xadd(ORDER_INTAKE_DEAD_STREAM, {'entry_id': entry_id, 'order': raw, 'error': error})
+        if isinstance(order, dict) and order.get('token'):
+            pipe.set(_order_token_key(order['token']), 'failed', ex=ORDER_TOKEN_TTL)
+    finished.extend(entry_id for entry_id, _, _, _ in dead)
+    if finished:
+        pipe.xack(ORDER_INTAKE_STREAM, ORDER_INTAKE_GROUP, *finished)
+        pipe.xdel(ORDER_INTAKE_STREAM, *finished)
+        pipe.hdel(ORDER_INTAKE_ATTEMPTS, *finished)
+    pipe.execute()
+
+    for event_payload in events:
+        publish_order_event('order_created', event_payload)
+    return reachable
+
+def run_order_intake_worker(consumer, batch_size=ORDER_INTAKE_BATCH_SIZE):
+    try:
+        redis_client.xgroup_create(ORDER_INTAKE_STREAM, ORDER_INTAKE_GROUP, id='0', mkstream=True)
+    except redis.ResponseError as e:
+        if 'BUSYGROUP' not in str(e):
+            raise
+
+    # Start with anything this consumer read but never acknowledged
+    read_id = '0'
+    backoff = 0
+    while True:
+        response = redis_client.xreadgroup(ORDER_INTAKE_GROUP, consumer, {ORDER_INTAKE_STREAM: read_id},
+                                           count=batch_size, block=1000)
+        entries = response[0][1] if response else []
+        if not entries:
+            if read_id == '0':
+                read_id = '>'
+                continue
+            # Idle: take over entries stuck with a consumer that died
+            _, entries, *_ = redis_client.xautoclaim(ORDER_INTAKE_STREAM, ORDER_INTAKE_GROUP, consumer,
+                                                     ORDER_INTAKE_CLAIM_IDLE_MS, count=batch_size)
+            if not entries:
+                continue
+
+        with app.app_context():
+            reachable = process_intake_entries(entries)
+        if reachable:
+            backoff = 0
+        else:
+            # Database outage: wait, then go back over this consumer's pending entries
+            backoff = min(max(backoff * 2, 1), ORDER_INTAKE_MAX_BACKOFF)
+            time.sleep(backoff)
+            read_id = '0'
+
+# QR Code Cache
+# A table's QR code never changes, so rendered PNGs are kept in a small LRU
+# in each worker and on disk (shared by workers, survives restarts). The disk
+# cache is pruned to the newest QR_DISK_CACHE_MAX_FILES files.
+QR_CACHE_SIZE = 256
+QR_DISK_CACHE_MAX_FILES = 2000
+QR_DEFAULT_BOX_SIZE = 10
+QR_MAX_BOX_SIZE = 20
+QR_CACHE_DIR = os.path.join(app.instance_path, 'qr_cache')
+_qr_cache = OrderedDict()
+_qr_cache_lock = threading.Lock()
+
+def _write_atomic(path, data):
+    # Write then rename so other workers never read a partial file
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def render_qr_png(url, box_size):
+    import qrcode
+
+    qr = qrcode.QRCode(version=1, box_size=box_size, border=5)
+    qr.add_data(url)
+    qr.make(fit=True)
+    img = qr.make_image(fill_color="black", back_color="white")
+
+    img_buffer = io.BytesIO()
+    img.save(img_buffer, format='PNG')
+    return img_buffer.getvalue()
+
+def _qr_cache_path(url, box_size):
+    key = hashlib.sha1(f'{url}|{box_size}'.encode()).hexdigest()
+    return os.path.join(QR_CACHE_DIR, f'{key}.png')
+
+def _remember_qr(url, box_size, png):
+    with _qr_cache_lock:
+        _qr_cache[(url, box_size)] = png
+        _qr_cache.move_to_end((url, box_size))
+        while len(_qr_cache) > QR_CACHE_SIZE:
+            _qr_cache.popitem(last=False)
+
+def _prune_qr_cache():
+    entries = [entry for entry in os.scandir(QR_CACHE_DIR) if entry.name.endswith('.png')]
+    if len(entries) <= QR_DISK_CACHE_MAX_FILES:
+        return
+    entries.sort(key=lambda entry: entry.stat().st_mtime)
+    for entry in entries[:len(entries) - QR_DISK_CACHE_MAX_FILES]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+def _store_qr(url, box_size, png, persist=True):
+    _remember_qr(url, box_size, png)
+    if not persist:
+        return
+    try:
+        os.makedirs(QR_CACHE_DIR, exist_ok=True)
+        _write_atomic(_qr_cache_path(url, box_size), png)
+        _prune_qr_cache()
+    except OSError as e:
+        print(f"QR cache write failed: {str(e)}")
+
+def _cached_qr(url, box_size):
+    with _qr_cache_lock:
+        png = _qr_cache.get((url, box_size))
+        if png is not None:
+            _qr_cache.move_to_end((url, box_size))
+            return png
+
+    try:
+        with open(_qr_cache_path(url, box_size), 'rb') as f:
+            png = f.read()
+    except OSError:
+        return None
+    _remember_qr(url, box_size, png)
+    return png
+
+def get_qr_png(url, box_size=QR_DEFAULT_BOX_SIZE, persist=True):
+    png = _cached_qr(url, box_size)
+    if png is None:
+        png = render_qr_png(url, box_size)
+        _store_qr(url, box_size, png, persist)
+    return png
+
+def get_qr_pngs(urls, box_size=QR_DEFAULT_BOX_SIZE, persist=True):
+    # Render whatever isn't cached yet in parallel, one process per core
+    pngs = {url: _cached_qr(url, box_size) for url in urls}
+    missing = [url for url, png in pngs.items() if png is None]
+    if len(missing) > 4:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor() as executor:
+            rendered = executor.map(render_qr_png, missing, [box_size] * len(missing))
+            for url, png in zip(missing, rendered):
+                _store_qr(url, box_size, png, persist)
+                pngs[url] = png
+    else:
+        for url in missing:
+            pngs[url] = get_qr_png(url, box_size, persist)
+    return [pngs[url] for url in urls]
 
-def init_db():
+def table_menu_url(table_number, base_url=None):
+    base_url = base_url or app.config['PUBLIC_BASE_URL']
+    if not base_url:
+        return url_for('qr_menu', table_number=table_number, _external=True)
+    return base_url.rstrip('/') + url_for('qr_menu', table_number=table_number)
+
+def build_qr_zip(table_urls, box_size=QR_DEFAULT_BOX_SIZE):
+    tables = list(table_urls)
+    pngs = get_qr_pngs([table_urls[table] for table in tables], box_size)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as archive:
+        for table, png in zip(tables, pngs):
+            archive.writestr(f'table_{table}_qr.png', png)
+    return buffer.getvalue()
+
+def build_qr_pdf(table_urls, box_size=QR_DEFAULT_BOX_SIZE):
+    # One printable page per table, with the table number under the code
+    from PIL import Image, ImageDraw
+
+    tables = list(table_urls)
+    pngs = get_qr_pngs([table_urls[table] for table in tables], box_size)
+    pages = []
+    for table, png in zip(tables, pngs):
+        code = Image.open(io.BytesIO(png)).convert('RGB')
+        page = Image.new('RGB', (code.width, code.height + 40), 'white')
+        page.paste(code, (0, 0))
+        ImageDraw.Draw(page).text((code.width // 2, code.height + 10), f'Table {table}', fill='black', anchor='mt')
+        pages.append(page)
+
+    buffer = io.BytesIO()
+    pages[0].save(buffer, format='PDF', save_all=True, append_images=pages[1:], resolution=150)
+    return buffer.getvalue()
+
+# Menu Images
+# Photos shipped in static/ are resized to a few widths as WebP and JPEG and
+# cached on disk under the source file's hash, so the menu can offer them
+# through srcset and phones download the smallest one that fits.
+MENU_IMAGE_WIDTHS = (320, 640, 960)
+MENU_IMAGE_QUALITY = 80
+MENU_IMAGE_FORMATS = {'webp': 'WEBP', 'jpg': 'JPEG'}
+MENU_IMAGE_DIR = os.path.join(app.instance_path, 'menu_images')
+MENU_IMAGE_SIZES = '(min-width: 1024px) 33vw, (min-width: 768px) 50vw, 100vw'
+_menu_image_hashes = {}
+_menu_image_widths = {}
+
+def _menu_image_source(image_url):
+    # Remote image URLs are used as is
+    prefix = app.static_url_path + '/'
+    if not image_url or not image_url.startswith(prefix):
+        return None
+    path = safe_join(app.static_folder, image_url[len(prefix):])
+    return path if path and os.path.isfile(path) else None
+
+def _menu_image_hash(path):
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    digest = _menu_image_hashes.get(key)
+    if digest is None:
+        with open(path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()[:16]
+        _menu_image_hashes[key] = digest
+    return digest
+
+def build_menu_image_variants(path, digest):
+    from PIL import Image
+
+    with Image.open(path) as source:
+        image = source.convert('RGB')
+    # Never upscale: small sources just get fewer variants
+    widths = sorted({min(width, image.width) for width in MENU_IMAGE_WIDTHS})
+
+    os.makedirs(MENU_IMAGE_DIR, exist_ok=True)
+    for width in widths:
+        height = round(image.height * width / image.width)
+        resized = image.resize((width, height), Image.LANCZOS) if width < image.width else image
+        for ext, image_format in MENU_IMAGE_FORMATS.items():
+            buffer = io.BytesIO()
+            resized.save(buffer, format=image_format, quality=MENU_IMAGE_QUALITY, optimize=True)
+            _write_atomic(os.path.join(MENU_IMAGE_DIR, f'{digest}-{width}.{ext}'), buffer.getvalue())
+    # Written last: its presence means every variant is on disk
+    _write_atomic(os.path.join(MENU_IMAGE_DIR, f'{digest}.json'), json.dumps(widths).encode())
+    return widths
+
+def _menu_image_variant_widths(path, digest):
+    widths = _menu_image_widths.get(digest)
+    if widths is None:
+        try:
+            with open(os.path.join(MENU_IMAGE_DIR, f'{digest}.json')) as f:
+                widths = json.load(f)
+        except (OSError, ValueError):
+            widths = build_menu_image_variants(path, digest)
+        _menu_image_widths[digest] = widths
+    return widths
+
+def get_menu_image(image_url):
+    path = _menu_image_source(image_url)
+    if path is None:
+        return None
+    try:
+        digest = _menu_image_hash(path)
+        widths = _menu_image_variant_widths(path, digest)
+    except (OSError, ValueError) as e:
+        print(f"Menu image processing failed: {str(e)}")
+        return None
+
+    def srcset(ext):
+        return ', '.join(
+            f"{url_for('menu_image', filename=f'{digest}-{width}.{ext}')} {width}w" for width in widths
+        )
+
+    fallback_width = widths[min(1, len(widths) - 1)]
+    return {
+        'src': url_for('menu_image', filename=f'{digest}-{fallback_width}.jpg'),
+        'srcset': srcset('jpg'),
+        'webp_srcset': srcset('webp'),
+        'sizes': MENU_IMAGE_SIZES
+    }
+
+# Schema Migrations
+# db.create_all() only creates missing tables, so changes to existing tables
+# are applied here. Each migration runs once, in order, and is recorded in
+# the schema_migrations table. Migrations must be safe on a fresh database
+# (where create_all has already built the current schema) and spell out
+# their own DDL rather than reading the models, which keep changing after
+# the migration is written.
+def _create_index(connection, name, table, columns, unique=False):
+    connection.execute(text(
+        f'CREATE {"UNIQUE " if unique else ""}INDEX IF NOT EXISTS {name} ON "{table}" ({", ".join(columns)})'
+    ))
+
+def _add_column(connection, table, name, column_type):
+    columns = {column['name'] for column in inspect(connection).get_columns(table)}
+    if name in columns:
+        return False
+    compiled = column_type.compile(dialect=connection.dialect)
+    connection.execute(text(f'ALTER TABLE "{table}" ADD COLUMN {name} {compiled}'))
+    return True
+
+def _migration_order_updated_at(connection):
+    if _add_column(connection, 'order', 'updated_at', db.DateTime()):
+        connection.execute(text('UPDATE "order" SET updated_at = created_at'))
+
+def _migration_query_indexes(connection):
+    _create_index(connection, 'ix_order_updated_at', 'order', ['updated_at'])
+    _create_index(connection, 'ix_menu_item_available_category', 'menu_item', ['available', 'category'])
+    _create_index(connection, 'ix_order_status_id', 'order', ['status', 'id'])
+    _create_index(connection, 'ix_order_user_id_created_at', 'order', ['user_id', 'created_at', 'id'])
+    _create_index(connection, 'ix_order_created_at', 'order', ['created_at', 'id'])
+    _create_index(connection, 'ix_order_item_order_id', 'order_item', ['order_id'])
+
+def _migration_order_intake_token(connection):
+    _add_column(connection, 'order', 'intake_token', db.String(32))
+    _create_index(connection, 'ix_order_intake_token', 'order', ['intake_token'], unique=True)
+
+def _migration_sales_rollups(connection):
+    connection.execute(text(
+        'CREATE TABLE IF NOT EXISTS daily_item_sales ('
+        'day DATE NOT NULL, menu_item_id INTEGER NOT NULL REFERENCES menu_item (id), '
+        'quantity INTEGER NOT NULL, revenue FLOAT NOT NULL, '
+        'PRIMARY KEY (day, menu_item_id))'
+    ))
+    connection.execute(text(
+        'CREATE TABLE IF NOT EXISTS daily_category_sales ('
+        'day DATE NOT NULL, category VARCHAR(50) NOT NULL, '
+        'quantity INTEGER NOT NULL, revenue FLOAT NOT NULL, '
+        'PRIMARY KEY (day, category))'
+    ))
+    connection.execute(text(
+        'CREATE TABLE IF NOT EXISTS daily_table_sales ('
+        'day DATE NOT NULL, table_number INTEGER NOT NULL, orders INTEGER NOT NULL, '
+        'revenue FLOAT NOT NULL, cancelled_orders INTEGER NOT NULL, '
+        'PRIMARY KEY (day, table_number))'
+    ))
+
+    # Backfill from order history, also in plain SQL (rebuild_sales_rollups
+    # follows the current models)
+    if connection.dialect.name == 'postgresql':
+        connection.exec_driver_sql('SET LOCAL statement_timeout = 0')
+    day = 'date(o.created_at)' if connection.dialect.name == 'sqlite' else 'CAST(o.created_at AS DATE)'
+    lines = ('FROM "order" o JOIN order_item oi ON oi.order_id = o.id '
+             'JOIN menu_item m ON oi.menu_item_id = m.id')
+    for table in ('daily_item_sales', 'daily_category_sales', 'daily_table_sales'):
+        connection.execute(text(f'DELETE FROM {table}'))
+    connection.execute(text(
+        f'INSERT INTO daily_item_sales (day, menu_item_id, quantity, revenue) '
+        f'SELECT {day}, oi.menu_item_id, SUM(oi.quantity), SUM(oi.quantity * oi.price_at_time) '
+        f"{lines} WHERE o.status = 'completed' GROUP BY {day}, oi.menu_item_id"
+    ))
+    connection.execute(text(
+        f'INSERT INTO daily_category_sales (day, category, quantity, revenue) '
+        f'SELECT {day}, m.category, SUM(oi.quantity), SUM(oi.quantity * oi.price_at_time) '
+        f"{lines} WHERE o.status = 'completed' GROUP BY {day}, m.category"
+    ))
+    connection.execute(text(
+        f'INSERT INTO daily_table_sales (day, table_number, orders, revenue, cancelled_orders) '
+        f'SELECT {day}, COALESCE(o.table_number, 0), '
+        f"COUNT(DISTINCT CASE WHEN o.status = 'completed' THEN o.id END), "
+        f"COALESCE(SUM(CASE WHEN o.status = 'completed' THEN oi.quantity * oi.price_at_time ELSE 0.0 END), 0.0), "
+        f"COUNT(DISTINCT CASE WHEN o.status = 'cancelled' THEN o.id END) "
+        f"{lines} WHERE o.status IN ('completed', 'cancelled') GROUP BY {day}, COALESCE(o.table_number, 0)"
+    ))
+
+MIGRATIONS = [
+    (1, 'Add order.updated_at', _migration_order_updated_at),
+    (2, 'Indexes for active orders, menu and order items', _migration_query_indexes),
+    (3, 'Add order.intake_token', _migration_order_intake_token),
+    (4, 'Daily sales rollup tables', _migration_sales_rollups),
+]
+
+def run_migrations():
+    with db.engine.begin() as connection:
+        connection.execute(text(
+            'CREATE TABLE IF NOT EXISTS schema_migrations ('
+            'version INTEGER PRIMARY KEY, description VARCHAR(200), applied_at TIMESTAMP)'
+        ))
+        applied = set(connection.execute(text('SELECT version FROM schema_migrations')).scalars())
+
+    for version, description, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        # One transaction per migration, so a failure leaves earlier ones applied
+        with db.engine.begin() as connection:
+            migrate(connection)
+            connection.execute(
+                text('INSERT INTO schema_migrations (version, description, applied_at) VALUES (:v, :d, :t)'),
+                {'v': version, 'd': description, 't': datetime.utcnow()}
+            )
+        print(f"Applied migration {version}: {description}")
+
+# Hot queries and the index each one is expected to use
+def _index_checks():
+    return [
+        ('active orders', 'ix_order_status_id',
+         db.select(Order).where(Order.status.in_(['pending', 'confirmed'])).order_by(Order.id)),
+        ('menu catalog', 'ix_menu_item_available_category',
+         db.select(MenuItem).where(MenuItem.available == True).order_by(MenuItem.category, MenuItem.id)),  # noqa: E712
+        ('menu category', 'ix_menu_item_available_category',
+         db.select(MenuItem).where(MenuItem.available == True, MenuItem.category == 'Appetizer')),  # noqa: E712
+        ('order items', 'ix_order_item_order_id',
+         db.select(OrderItem).where(OrderItem.order_id.in_([1, 2, 3]))),
+        ('user orders', 'ix_order_user_id_created_at',
+         db.select(Order).where(Order.user_id == 1).order_by(Order.created_at.desc(), Order.id.desc())),
+    ]
+
+def explain_index_usage():
+    results = []
+    with db.engine.begin() as connection:
+        dialect = connection.dialect.name
+        if dialect == 'postgresql':
+            # Tiny tables always favour a sequential scan; ask the planner
+            # whether the index is usable rather than whether it is cheapest
+            connection.execute(text('SET LOCAL enable_seqscan = off'))
+        for name, index_name, statement in _index_checks():
+            sql = str(statement.compile(dialect=connection.dialect, compile_kwargs={'literal_binds': True}))
+            prefix = 'EXPLAIN QUERY PLAN ' if dialect == 'sqlite' else 'EXPLAIN '
+            plan = '\n'.join(str(row[-1]) for row in connection.execute(text(prefix + sql)))
+            results.append((name, index_name, index_name in plan, plan))
+    return results
+
+def seed_menu():
+    # Add sample menu items to an empty menu (`flask seed-menu`)
+    if MenuItem.query.count() > 0:
+        return 0
+
+    sample_items = [
+        # Appetizers
+        MenuItem(
+            name='Samosa',
+            description='Crispy pastry filled with spiced potatoes and peas',
+            price=6.99,
+            category='Appetizer',
+            available=True
+        ),
+        MenuItem(
+            name='Onion Bhaji',
+            description='Crispy onion fritters with Indian spices',
+            price=5.99,
+            category='Appetizer',
+            available=True
+        ),
+        
+        # Main Courses
+        MenuItem(
+            name='Butter Chicken',
+            description='Tender chicken in a rich, creamy tomato sauce',
+            price=16.99,
+            category='Main Course',
+            available=True
+        ),
+        MenuItem(
+            name='Paneer Tikka Masala',
+            description='Grilled cottage cheese in spiced tomato gravy',
+            price=15.99,
+            category='Main Course',
+            available=True
+        ),
+        
+        # Breads
+        MenuItem(
+            name='Garlic Naan',
+            description='Fresh bread with garlic and butter',
+            price=3.99,
+            category='Bread',
+            available=True
+        ),
+        MenuItem(
+            name='Roti',
+            description='Whole wheat flatbread',
+            price=2.99,
+            category='Bread',
+            available=True
+        ),
+        
+        # Beverages
+        MenuItem(
+            name='Mango Lassi',
+            description='Sweet yogurt drink with mango',
+            price=4.99,
+            category='Beverage',
+            available=True
+        ),
+        MenuItem(
+            name='Masala Chai',
+            description='Indian spiced tea with milk',
+            price=3.99,
+            category='Beverage',
+            available=True
+        )
+    ]
+    
+    for item in sample_items:
+        db.session.add(item)
+    
+    db.session.commit()
+    return len(sample_items)
+
+def init_db(seed=False):
     try:
         with app.app_context():
             db.create_all()
-            
-            # Add sample menu items if they don't exist
-            if MenuItem.query.count() == 0:
-                sample_items = [
-                    # Appetizers
-                    MenuItem(
-                        name='Samosa',
-                        description='Crispy pastry filled with spiced potatoes and peas',
-                        price=6.99,
-                        category='Appetizer',
-                        available=True
-                    ),
-                    MenuItem(
-                        name='Onion Bhaji',
-                        description='Crispy onion fritters with Indian spices',
-                        price=5.99,
-                        category='Appetizer',
-                        available=True
-                    ),
-                    
-                    # Main Courses
-                    MenuItem(
-                        name='Butter Chicken',
-                        description='Tender chicken in a rich, creamy tomato sauce',
-                        price=16.99,
-                        category='Main Course',
-                        available=True
-                    ),
-                    MenuItem(
-                        name='Paneer Tikka Masala',
-                        description='Grilled cottage cheese in spiced tomato gravy',
-                        price=15.99,
-                        category='Main Course',
-                        available=True
-                    ),
-                    
-                    # Breads
-                    MenuItem(
-                        name='Garlic Naan',
-                        description='Fresh bread with garlic and butter',
-                        price=3.99,
-                        category='Bread',
-                        available=True
-                    ),
-                    MenuItem(
-                        name='Roti',
-                        description='Whole wheat flatbread',
-                        price=2.99,
-                        category='Bread',
-                        available=True
-                    ),
-                    
-                    # Beverages
-                    MenuItem(
-                        name='Mango Lassi',
-                        description='Sweet yogurt drink with mango',
-                        price=4.99,
-                        category='Beverage',
-                        available=True
-                    ),
-                    MenuItem(
-                        name='Masala Chai',
-                        description='Indian spiced tea with milk',
-                        price=3.99,
-                        category='Beverage',
-                        available=True
-                    )
-                ]
-                
-                for item in sample_items:
-                    db.session.add(item)
-                
-                db.session.commit()
+            run_migrations()
+            if seed:
+                seed_menu()
     except Exception as e:
         print(f"Database initialization error: {str(e)}")
         db.session.rollback()
@@ -223,46 +1759,36 @@ def logout():
 
 @app.route('/add_to_cart/<int:item_id>', methods=['POST'])
 def add_to_cart(item_id):
-    if 'cart' not in session:
-        session['cart'] = []
-    
-    menu_item = MenuItem.query.get_or_404(item_id)
-    cart_item = {
-        'id': menu_item.id,
-        'name': menu_item.name,
-        'price': menu_item.price,
-        'quantity': int(request.form.get('quantity', 1))
-    }
-    session['cart'].append(cart_item)
-    session.modified = True
+    if item_id not in get_menu_index():
+        abort(404)
+
+    quantity = request.form.get('quantity', 1, type=int)
+    if not quantity or quantity < 1:
+        return redirect(url_for('menu', notice='invalid_quantity'))
+
+    cart_add(item_id, quantity)
     
-    flash(f'{menu_item.name} added to cart!')
-    return redirect(url_for('menu'))
+    return redirect(url_for('menu', notice='added', item=item_id))
 
 @app.route('/cart')
 def cart():
-    if 'cart' not in session:
-        session['cart'] = []
-    
-    total_amount = sum(item['price'] * item['quantity'] for item in session['cart'])
-    return render_template('cart.html', cart=session['cart'], total_amount=total_amount)
+    cart_items = get_cart_items()
+    total_amount = sum(item['price'] * item['quantity'] for item in cart_items)
+    return render_template('cart.html', cart=cart_items, total_amount=total_amount)
 
 @app.route('/remove_from_cart/<int:item_id>', methods=['POST'])
 def remove_from_cart(item_id):
-    if 'cart' in session:
-        session['cart'] = [item for item in session['cart'] if item['id'] != item_id]
-        session.modified = True
-        flash('Item removed from cart')
-    return redirect(url_for('cart'))
+    cart_remove(item_id)
+    return redirect(url_for('cart', notice='removed'))
 
 @app.route('/place_order', methods=['POST'])
 def place_order():
-    if 'cart' not in session or not session['cart']:
-        flash('Your cart is empty')
-        return redirect(url_for('cart'))
+    cart_items = get_cart_items()
+    if not cart_items:
+        return redirect(url_for('cart', notice='empty'))
 
     try:
-        total_amount = sum(item['price'] * item['quantity'] for item in session['cart'])
+        total_amount = sum(item['price'] * item['quantity'] for item in cart_items)
         
         # Create the order
         order = Order(
@@ -274,83 +1800,114 @@ def place_order():
         db.session.flush()  # Get the order ID
         
         # Add order items
-        for item in session['cart']:
-            order_item = OrderItem(
-                order_id=order.id,
-                menu_item_id=item['id'],
-                quantity=item['quantity'],
-                price_at_time=item['price']
-            )
-            db.session.add(order_item)
+        db.session.execute(db.insert(OrderItem), [{
+            'order_id': order.id,
+            'menu_item_id': item['id'],
+            'quantity': item['quantity'],
+            'price_at_time': item['price']
+        } for item in cart_items])
         
+        order_event = order_created_payload(
+            order, [(item['name'], item['quantity'], item['price']) for item in cart_items])
         db.session.commit()
+        publish_order_event('order_created', order_event)
         
         # Clear the cart
-        session['cart'] = []
-        session.modified = True
+        cart_clear()
         
-        flash('Order placed successfully!')
-        return redirect(url_for('menu'))
+        return redirect(url_for('menu', notice='placed'))
         
     except Exception as e:
         db.session.rollback()
-        flash('Error placing order. Please try again.')
-        return redirect(url_for('cart'))
+        return redirect(url_for('cart', notice='order_failed'))
 
 @app.route('/menu')
 def menu():
-    menu_items = MenuItem.query.filter_by(available=True).all()
-    menu_by_category = {}
-    categories = sorted(set(item.category for item in menu_items))
-    
-    for category in categories:
-        menu_by_category[category] = [item for item in menu_items if item.category == category]
-    
-    return render_template('menu.html', menu_items=menu_by_category, categories=categories)
+    def render():
+        categories, menu_by_category = get_menu_catalog()
+        return render_template('menu.html', menu_items=menu_by_category, categories=categories)
+
+    return conditional_menu_response(menu_etag('menu'), render)
 
 @app.route('/qr/<int:table_number>')
+@rate_limited('qr_menu')
 def qr_menu(table_number):
-    categories = ['Appetizer', 'Main Course', 'Dessert', 'Beverage']
-    menu_items = {}
-    for category in categories:
-        menu_items[category] = MenuItem.query.filter_by(category=category, available=True).all()
-    return render_template('qr_menu.html', menu_items=menu_items, categories=categories, table_number=table_number)
+    def render():
+        categories = ['Appetizer', 'Main Course', 'Dessert', 'Beverage']
+        _, menu_by_category = get_menu_catalog()
+        menu_items = {category: menu_by_category.get(category, []) for category in categories}
+        return render_template('qr_menu.html', menu_items=menu_items, categories=categories, table_number=table_number)
+
+    return conditional_menu_response(menu_etag('qr', table_number), render)
 
 @app.route('/api/place_order', methods=['POST'])
+@rate_limited('place_order')
+@idempotent
 def place_order_api():
-    data = request.get_json()
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Expected a JSON object'}), 400
     table_number = data.get('table_number')
     items = data.get('items', [])
     
     if not items:
         return jsonify({'error': 'No items in order'}), 400
     
-    # Create new order
-    order = Order(table_number=table_number)
-    total_amount = 0
-    
-    # Add items to order
+    # Resolve every requested menu item with a single IN query instead of
+    # one lookup per line, then validate the order in memory.
+    lines = []
     for item in items:
-        menu_item = MenuItem.query.get(item['id'])
-        if not menu_item:
-            continue
-        
-        order_item = OrderItem(
-            menu_item_id=menu_item.id,
-            quantity=item['quantity'],
-            price_at_time=menu_item.price,
-            special_instructions=item.get('special_instructions', '')
-        )
-        total_amount += menu_item.price * item['quantity']
-        order.items.append(order_item)
-    
-    order.total_amount = total_amount
+        try:
+            lines.append((int(item['id']), int(item['quantity']), item.get('special_instructions', '')))
+        except (KeyError, TypeError, ValueError):
+            return jsonify({'error': 'Invalid order item'}), 400
+
+    if any(quantity < 1 for _, quantity, _ in lines):
+        return jsonify({'error': 'Invalid quantity'}), 400
+
+    if app.config['ORDER_INTAKE_MODE'] == 'queue':
+        # Validate against the cached menu and leave the write to the intake worker
+        menu_index = get_menu_index()
+        lines = [line for line in lines if line[0] in menu_index]
+        if not lines:
+            return jsonify({'error': 'No valid items in order'}), 400
+        token = enqueue_order(table_number, lines, menu_index)
+        return jsonify({
+            'message': 'Order received',
+            'order_token': token,
+            'status_url': url_for('order_token_status', token=token)
+        }), 202
+
+    item_ids = {item_id for item_id, _, _ in lines}
+    menu_items = {
+        menu_item.id: menu_item
+        for menu_item in MenuItem.query.filter(MenuItem.id.in_(item_ids), MenuItem.available == True).all()
+    }
+    lines = [line for line in lines if line[0] in menu_items]
+    if not lines:
+        return jsonify({'error': 'No valid items in order'}), 400
+
+    total_amount = sum(menu_items[item_id].price * quantity for item_id, quantity, _ in lines)
+
+    # Write the order, then all of its items in one executemany insert
+    order = Order(table_number=table_number, total_amount=total_amount)
     db.session.add(order)
+    db.session.flush()
+    db.session.execute(db.insert(OrderItem), [{
+        'order_id': order.id,
+        'menu_item_id': item_id,
+        'quantity': quantity,
+        'price_at_time': menu_items[item_id].price,
+        'special_instructions': special_instructions
+    } for item_id, quantity, special_instructions in lines])
+    order_event = order_created_payload(
+        order, [(menu_items[item_id].name, quantity, menu_items[item_id].price) for item_id, quantity, _ in lines])
     db.session.commit()
+    publish_order_event('order_created', order_event)
     
     return jsonify({
         'message': 'Order placed successfully',
-        'order_id': order.id
+        'order_id': order_event['id']
     }), 201
 
 @app.route('/api/order_status/<int:order_id>')
@@ -362,22 +1919,91 @@ def order_status(order_id):
         'total_amount': order.total_amount
     })
 
+@app.route('/api/order_status/<token>')
+def order_token_status(token):
+    # Orders taken through the intake queue are looked up by their token
+    try:
+        state = redis_client.get(_order_token_key(token))
+    except redis.RedisError:
+        state = None
+
+    if state == b'queued':
+        return jsonify({'status': 'queued', 'order_token': token}), 202
+    if state == b'failed':
+        return jsonify({'status': 'failed', 'order_token': token, 'error': 'Order could not be saved'})
+
+    if state is not None:
+        order = Order.query.get_or_404(int(state))
+    else:
+        # Token record expired (or Redis is down): fall back to the database
+        order = Order.query.filter_by(intake_token=token).first_or_404()
+    return jsonify({
+        'order_id': order.id,
+        'status': order.status,
+        'created_at': order.created_at,
+        'total_amount': order.total_amount
+    })
+
 @app.route('/generate_qr/<int:table_number>')
+@rate_limited('generate_qr')
 def generate_qr(table_number):
     # Generate QR code for the table's menu URL
-    menu_url = url_for('qr_menu', table_number=table_number, _external=True)
-    qr = qrcode.QRCode(version=1, box_size=10, border=5)
-    qr.add_data(menu_url)
-    qr.make(fit=True)
-    
-    img = qr.make_image(fill_color="black", back_color="white")
-    
-    # Save QR code to bytes buffer
-    img_buffer = io.BytesIO()
-    img.save(img_buffer, format='PNG')
-    img_buffer.seek(0)
-    
-    return send_file(img_buffer, mimetype='image/png')
+    if not 1 <= table_number <= app.config['TABLE_COUNT']:
+        abort(404)
+    menu_url = table_menu_url(table_number)
+    box_size = min(max(request.args.get('size', QR_DEFAULT_BOX_SIZE, type=int), 1), QR_MAX_BOX_SIZE)
+    # Without PUBLIC_BASE_URL the URL comes from the Host header, so only the
+    # in-memory LRU caches it
+    png = get_qr_png(menu_url, box_size, persist=bool(app.config['PUBLIC_BASE_URL']))
+
+    response = send_file(io.BytesIO(png), mimetype='image/png',
+                         etag=hashlib.sha1(png).hexdigest(), max_age=86400)
+    response.cache_control.public = True
+    return response
+
+@app.route('/menu_images/<filename>')
+def menu_image(filename):
+    # Variant names include the source hash, so they can be cached forever
+    response = send_from_directory(MENU_IMAGE_DIR, filename, max_age=ASSET_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+@app.route('/static/dist/<path:filename>')
+def static_asset(filename):
+    path = safe_join(ASSET_DIST_DIR, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    encoding = None
+    for candidate, suffix in ASSET_ENCODINGS:
+        if request.accept_encodings.quality(candidate) > 0 and os.path.isfile(path + suffix):
+            encoding = candidate
+            path += suffix
+            break
+
+    response = send_file(path, mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+                         max_age=ASSET_MAX_AGE)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+@app.route('/admin/qr_codes')
+@login_required
+def bulk_qr_codes():
+    # Every table's QR code as one printable ZIP (default) or multi-page PDF
+    tables = min(max(request.args.get('tables', app.config['TABLE_COUNT'], type=int), 1), 200)
+    box_size = min(max(request.args.get('size', QR_DEFAULT_BOX_SIZE, type=int), 1), QR_MAX_BOX_SIZE)
+    table_urls = {table: table_menu_url(table) for table in range(1, tables + 1)}
+
+    if request.args.get('format') == 'pdf':
+        return send_file(io.BytesIO(build_qr_pdf(table_urls, box_size)), mimetype='application/pdf',
+                         as_attachment=True, download_name='table_qr_codes.pdf')
+    return send_file(io.BytesIO(build_qr_zip(table_urls, box_size)), mimetype='application/zip',
+                     as_attachment=True, download_name='table_qr_codes.zip')
 
 @app.route('/admin')
 @login_required
@@ -385,12 +2011,8 @@ def admin():
     # In a production environment, you should check if the user is an admin
     return render_template('admin.html')
 
-@app.route('/api/active_orders')
-@login_required
-def active_orders():
-    # Get all non-completed orders
-    orders = Order.query.filter(Order.status.in_(['pending', 'confirmed'])).all()
-    return jsonify([{
+def serialize_order(order):
+    return {
         'id': order.id,
         'table_number': order.table_number,
         'status': order.status,
@@ -400,7 +2022,125 @@ def active_orders():
             'quantity': item.quantity,
             'price': item.price_at_time
         } for item in order.items]
-    } for order in orders])
+    }
+
+# Order History
+# Keyset pagination on (created_at, id), newest first: each page is an index
+# range scan that starts where the previous one ended, so deep pages cost the
+# same as the first one. Items are eager-loaded for the visible page only.
+ORDER_HISTORY_PAGE_SIZE = 20
+
+def _parse_history_cursor(cursor):
+    created_at, _, order_id = cursor.rpartition('_')
+    return datetime.fromisoformat(created_at), int(order_id)
+
+def get_order_history(user_id, cursor=None, limit=ORDER_HISTORY_PAGE_SIZE):
+    query = Order.query.options(selectinload(Order.items).joinedload(OrderItem.menu_item))
+    if user_id is not None:
+        query = query.filter(Order.user_id == user_id)
+    if cursor:
+        created_at, order_id = _parse_history_cursor(cursor)
+        query = query.filter(db.or_(
+            Order.created_at < created_at,
+            db.and_(Order.created_at == created_at, Order.id < order_id)
+        ))
+
+    # One extra row tells us whether there is another page
+    orders = query.order_by(Order.created_at.desc(), Order.id.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(orders) > limit:
+        orders = orders[:limit]
+        next_cursor = f'{orders[-1].created_at.isoformat()}_{orders[-1].id}'
+    return orders, next_cursor
+
+def _order_history_args():
+    # ?scope=all lists every order (staff only); otherwise only the user's own
+    if request.args.get('scope') == 'all':
+        if not is_admin(current_user):
+            abort(403)
+        user_id = None
+    else:
+        user_id = current_user.id
+    limit = min(max(request.args.get('limit', ORDER_HISTORY_PAGE_SIZE, type=int), 1), 100)
+    return user_id, request.args.get('cursor'), limit
+
+@app.route('/orders')
+@login_required
+def orders():
+    user_id, cursor, limit = _order_history_args()
+    try:
+        order_page, next_cursor = get_order_history(user_id, cursor, limit)
+    except ValueError:
+        abort(400)
+    return render_template('orders.html', orders=order_page, next_cursor=next_cursor,
+                           scope='all' if user_id is None else None)
+
+@app.route('/api/orders')
+@login_required
+def orders_api():
+    user_id, cursor, limit = _order_history_args()
+    try:
+        order_page, next_cursor = get_order_history(user_id, cursor, limit)
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    return jsonify({
+        'orders': [{
+            **serialize_order(order),
+            'created_at': order.created_at.isoformat()
+        } for order in order_page],
+        'next_cursor': next_cursor
+    })
+
+# Delta sync re-reads a short window before the cursor, so changes committed
+# slightly out of timestamp order (other workers, clock skew) aren't missed
+ORDER_SYNC_OVERLAP = timedelta(seconds=5)
+
+@app.route('/api/active_orders')
+@login_required
+def active_orders():
+    since = request.args.get('since')
+    # Items and their menu entries are loaded up front (one extra SELECT in
+    # total) so the query count doesn't grow with the number of open orders
+    query = Order.query.options(selectinload(Order.items).joinedload(OrderItem.menu_item))
+
+    if since is None:
+        # Get all non-completed orders
+        orders = query.filter(Order.status.in_(['pending', 'confirmed'])).order_by(Order.id).all()
+        return jsonify([serialize_order(order) for order in orders])
+
+    # ?since=<cursor>: only orders created, changed or closed after the cursor.
+    # An empty cursor returns every active order along with a first cursor.
+    if since:
+        try:
+            cursor = datetime.fromisoformat(since)
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        orders = (query.filter(Order.updated_at > cursor - ORDER_SYNC_OVERLAP)
+                  .order_by(Order.updated_at, Order.id)
+                  .all())
+    else:
+        cursor = None
+        orders = query.filter(Order.status.in_(['pending', 'confirmed'])).order_by(Order.id).all()
+
+    for order in orders:
+        if order.updated_at and (cursor is None or order.updated_at > cursor):
+            cursor = order.updated_at
+
+    return jsonify({
+        'orders': [serialize_order(order) for order in orders if order.status in ['pending', 'confirmed']],
+        'closed': [order.id for order in orders if order.status not in ['pending', 'confirmed']],
+        'cursor': (cursor or datetime.utcnow()).isoformat()
+    })
+
+@app.route('/api/order_events')
+@login_required
+def order_events():
+    # Server-Sent Events feed of order_created / order_status events
+    return Response(
+        stream_order_events(app.config['ORDER_EVENTS_MAX_SECONDS']),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
 @app.route('/api/update_order_status/<int:order_id>', methods=['POST'])
 @login_required
@@ -412,13 +2152,469 @@ def update_order_status(order_id):
         return jsonify({'success': False, 'error': 'Invalid status'}), 400
     
     order = Order.query.get_or_404(order_id)
-    order.status = new_status
+    previous_status = order.status
+    if previous_status == new_status:
+        return jsonify({'success': True})
+
+    # Compare-and-set so two staff changing the same order can't both apply
+    # (and double count it in the sales rollups)
+    result = db.session.execute(
+        db.update(Order)
+        .where(Order.id == order.id, Order.status == previous_status)
+        .values(status=new_status, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': 'Order was changed by someone else'}), 409
+    apply_status_to_rollups(order, previous_status, new_status)
+
+    order_event = {
+        'id': order.id,
+        'table_number': order.table_number,
+        'status': new_status,
+        'total_amount': order.total_amount
+    }
     db.session.commit()
+    publish_order_event('order_status', order_event)
     
     return jsonify({'success': True})
 
+@app.route('/api/analytics')
+@login_required
+def analytics():
+    # Answered from the daily rollups only, so cost depends on the date
+    # range, not on how many orders have ever been placed
+    try:
+        end = date.fromisoformat(request.args['to']) if 'to' in request.args else datetime.utcnow().date()
+        start = date.fromisoformat(request.args['from']) if 'from' in request.args else end - timedelta(days=29)
+    except ValueError:
+        return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 100)
+
+    daily = (db.session.query(DailyTableSales.day,
+                              db.func.sum(DailyTableSales.orders),
+                              db.func.sum(DailyTableSales.revenue),
+                              db.func.sum(DailyTableSales.cancelled_orders))
+             .filter(DailyTableSales.day.between(start, end))
+             .group_by(DailyTableSales.day)
+             .order_by(DailyTableSales.day)
+             .all())
+    top_dishes = (db.session.query(DailyItemSales.menu_item_id, MenuItem.name,
+                                   db.func.sum(DailyItemSales.quantity).label('quantity'),
+                                   db.func.sum(DailyItemSales.revenue).label('revenue'))
+                  .join(MenuItem, DailyItemSales.menu_item_id == MenuItem.id)
+                  .filter(DailyItemSales.day.between(start, end))
+                  .group_by(DailyItemSales.menu_item_id, MenuItem.name)
+                  .order_by(db.desc('revenue'))
+                  .limit(limit)
+                  .all())
+    categories = (db.session.query(DailyCategorySales.category,
+                                   db.func.sum(DailyCategorySales.quantity),
+                                   db.func.sum(DailyCategorySales.revenue).label('revenue'))
+                  .filter(DailyCategorySales.day.between(start, end))
+                  .group_by(DailyCategorySales.category)
+                  .order_by(db.desc('revenue'))
+                  .all())
+    tables = (db.session.query(DailyTableSales.table_number,
+                               db.func.sum(DailyTableSales.orders),
+                               db.func.sum(DailyTableSales.revenue).label('revenue'))
+              .filter(DailyTableSales.day.between(start, end))
+              .group_by(DailyTableSales.table_number)
+              .order_by(DailyTableSales.table_number)
+              .all())
+
+    return jsonify({
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'daily': [{
+            'day': day.isoformat(),
+            'orders': orders,
+            'revenue': round(revenue, 2),
+            'cancelled_orders': cancelled
+        } for day, orders, revenue, cancelled in daily],
+        'top_dishes': [{
+            'menu_item_id': menu_item_id,
+            'name': name,
+            'quantity': quantity,
+            'revenue': round(revenue, 2)
+        } for menu_item_id, name, quantity, revenue in top_dishes],
+        'categories': [{
+            'category': category,
+            'quantity': quantity,
+            'revenue': round(revenue, 2)
+        } for category, quantity, revenue in categories],
+        'tables': [{
+            'table_number': table_number or None,
+            'orders': orders,
+            'revenue': round(revenue, 2)
+        } for table_number, orders, revenue in tables]
+    })
+
+# Order Export
+# Rows come off a server-side cursor in batches and are written straight to
+# the response, so an export holds one batch in memory whether it covers a
+# day or a year. It uses its own connection rather than the request session.
+EXPORT_BATCH_SIZE = 1000
+EXPORT_CHUNK_BYTES = 64 * 1024
+EXPORT_COLUMNS = ['order_id', 'created_at', 'table_number', 'status', 'user_id', 'order_total',
+                  'menu_item_id', 'item_name', 'category', 'quantity', 'price', 'line_total',
+                  'special_instructions']
+
+def iter_order_export_rows(start, end):
+    # One row per line item; orders without items still get a row
+    query = (db.select(Order.id, Order.created_at, Order.table_number, Order.status,
+                       Order.user_id, Order.total_amount, OrderItem.menu_item_id,
+                       MenuItem.name, MenuItem.category, OrderItem.quantity,
+                       OrderItem.price_at_time, OrderItem.special_instructions)
+             .outerjoin(OrderItem, OrderItem.order_id == Order.id)
+             .outerjoin(MenuItem, OrderItem.menu_item_id == MenuItem.id)
+             .where(Order.created_at >= start, Order.created_at < end)
+             .order_by(Order.created_at, Order.id))
+
+    with db.engine.connect() as connection:
+        if connection.dialect.name == 'postgresql':
+            # A year of orders can outlast the pool's default statement_timeout,
+            # and a slow download keeps the transaction idle between batches
+            connection.exec_driver_sql('SET LOCAL statement_timeout = 0')
+            connection.exec_driver_sql('SET LOCAL idle_in_transaction_session_timeout = 0')
+        result = connection.execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE).execute(query)
+        for (order_id, created_at, table_number, status, user_id, total, menu_item_id,
+             name, category, quantity, price, instructions) in result:
+            yield [order_id, created_at, table_number, status, user_id, round(total, 2),
+                   menu_item_id, name, category, quantity, price,
+                   round(quantity * price, 2) if quantity is not None else None, instructions]
+
+# Spreadsheet apps run cells starting with these as formulas, and special
+# instructions are typed in by guests
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+def _csv_safe(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+def _csv_unescape(value):
+    # Undo _csv_safe, so a menu export can be imported back unchanged
+    if isinstance(value, str) and value.startswith("'") and value[1:].startswith(FORMULA_PREFIXES):
+        return value[1:]
+    return value
+
+def stream_orders_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        row[1] = row[1].isoformat()
+        writer.writerow([_csv_safe(value) for value in row])
+        if buffer.tell() >= EXPORT_CHUNK_BYTES:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def stream_orders_xlsx(rows):
+    # openpyxl's write-only mode spools rows to a temp file instead of
+    # building the sheet in memory; the finished file is then sent in chunks
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Orders')
+    sheet.append(EXPORT_COLUMNS)
+    for row in rows:
+        # openpyxl stores strings starting with '=' as formulas unless the
+        # cell is explicitly typed as a string
+        for index, value in enumerate(row):
+            if isinstance(value, str) and value.startswith('='):
+                row[index] = WriteOnlyCell(sheet, value)
+                row[index].data_type = 's'
+        sheet.append(row)
+    with tempfile.TemporaryFile() as output:
+        workbook.save(output)
+        output.seek(0)
+        while chunk := output.read(EXPORT_CHUNK_BYTES):
+            yield chunk
+
+@app.route('/admin/export/orders')
+@login_required
+def export_orders():
+    # ?from=YYYY-MM-DD&to=YYYY-MM-DD (inclusive, default: this month so far)
+    try:
+        end = date.fromisoformat(request.args['to']) if 'to' in request.args else datetime.utcnow().date()
+        start = date.fromisoformat(request.args['from']) if 'from' in request.args else end.replace(day=1)
+    except ValueError:
+        return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+    export_format = request.args.get('format', 'csv')
+    if export_format not in ('csv', 'xlsx'):
+        return jsonify({'error': 'Format must be csv or xlsx'}), 400
+
+    rows = iter_order_export_rows(datetime.combine(start, datetime.min.time()),
+                                  datetime.combine(end + timedelta(days=1), datetime.min.time()))
+    filename = f'orders_{start.isoformat()}_{end.isoformat()}.{export_format}'
+    if export_format == 'xlsx':
+        body = stream_orders_xlsx(rows)
+        mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    else:
+        body = stream_orders_csv(rows)
+        mimetype = 'text/csv'
+    response = Response(stream_with_context(body), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+# Menu Management
+# Bulk changes run as a couple of executemany statements in one transaction.
+# Core statements skip the before_flush hook, so each bulk change flags the
+# menu as changed itself: the version is bumped once, after the commit.
+MENU_EXPORT_COLUMNS = ['id', 'name', 'description', 'price', 'category', 'image_url', 'available']
+MENU_FIELD_LENGTHS = {'name': 100, 'category': 50, 'image_url': 200}
+
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    if str(value).strip().lower() in ('1', 'true', 'yes', 'y'):
+        return True
+    if str(value).strip().lower() in ('0', 'false', 'no', 'n'):
+        return False
+    raise ValueError('available must be true or false')
+
+def _parse_menu_row(raw):
+    # Only the fields present are set, so updates can be partial
+    row = {}
+    if raw.get('id') not in (None, ''):
+        try:
+            row['id'] = int(raw['id'])
+        except (TypeError, ValueError):
+            raise ValueError('id must be a number')
+    # Blank values (e.g. empty CSV cells) leave a field unchanged; JSON null
+    # clears the description or image
+    for field in ('name', 'category', 'description', 'image_url'):
+        if raw.get(field) is None:
+            if field in raw and field in ('description', 'image_url'):
+                row[field] = None
+            continue
+        value = str(raw[field]).strip()
+        if not value:
+            continue
+        if len(value) > MENU_FIELD_LENGTHS.get(field, len(value)):
+            raise ValueError(f'{field} is longer than {MENU_FIELD_LENGTHS[field]} characters')
+        row[field] = value
+    if raw.get('price') not in (None, ''):
+        try:
+            row['price'] = round(float(raw['price']), 2)
+        except (TypeError, ValueError):
+            raise ValueError('price must be a number')
+        if not 0 <= row['price'] < 1000000:
+            raise ValueError('price must be between 0 and 1000000')
+    if raw.get('available') not in (None, ''):
+        row['available'] = _parse_bool(raw['available'])
+    return row
+
+def upsert_menu_items(raw_rows):
+    # Rows are matched on id, else on an existing item's name; the rest are
+    # inserted. Returns (inserted, updated, errors); nothing is written if
+    # any row is invalid.
+    existing_ids, ids_by_name = set(), {}
+    for item_id, name in db.session.execute(db.select(MenuItem.id, MenuItem.name)):
+        existing_ids.add(item_id)
+        ids_by_name.setdefault(name, []).append(item_id)
+
+    inserts, updates, errors, seen = [], [], [], set()
+    for line, raw in raw_rows:
+        try:
+            row = _parse_menu_row(raw)
+        except (TypeError, ValueError) as e:
+            errors.append({'row': line, 'error': str(e)})
+            continue
+
+        item_id = row.get('id')
+        if item_id is None:
+            matches = ids_by_name.get(row.get('name'), [])
+            if len(matches) > 1:
+                errors.append({'row': line, 'error': f"several items are named {row['name']!r}; give an id"})
+                continue
+            item_id = matches[0] if matches else None
+        elif item_id not in existing_ids:
+            errors.append({'row': line, 'error': f'no menu item with id {item_id}'})
+            continue
+
+        key = item_id if item_id is not None else row.get('name')
+        if key in seen:
+            errors.append({'row': line, 'error': 'item appears more than once'})
+            continue
+        seen.add(key)
+
+        if item_id is not None:
+            updates.append({**row, 'id': item_id})
+        elif 'name' not in row or 'price' not in row or 'category' not in row:
+            errors.append({'row': line, 'error': 'new items need name, price and category'})
+        else:
+            inserts.append({'available': True, **row})
+
+    if errors:
+        return 0, 0, errors
+    if updates:
+        db.session.execute(db.update(MenuItem), updates)
+    if inserts:
+        db.session.execute(db.insert(MenuItem), inserts)
+    if updates or inserts:
+        db.session.info['menu_changed'] = True
+    db.session.commit()
+    return len(inserts), len(updates), []
+
+def _menu_import_rows():
+    # CSV (file upload or text/csv body) or JSON ({"items": [...]} or a list)
+    upload = request.files.get('file')
+    if upload is not None or request.mimetype == 'text/csv':
+        text_body = (upload.read() if upload is not None else request.get_data()).decode('utf-8-sig')
+        # Line numbers count the header row
+        return [(line, {key: _csv_unescape(value) for key, value in row.items()})
+                for line, row in enumerate(csv.DictReader(io.StringIO(text_body)), start=2)]
+    data = request.get_json(silent=True)
+    items = data.get('items') if isinstance(data, dict) else data
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        raise ValueError('Send a CSV file or a JSON list of menu items')
+    return list(enumerate(items, start=1))
+
+@app.route('/api/menu/import', methods=['POST'])
+@admin_required
+def import_menu():
+    try:
+        rows = _menu_import_rows()
+    except (UnicodeDecodeError, csv.Error, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    if not rows:
+        return jsonify({'error': 'No menu items to import'}), 400
+
+    inserted, updated, errors = upsert_menu_items(rows)
+    if errors:
+        return jsonify({'error': 'Invalid menu items, nothing was imported', 'rows': errors}), 400
+    return jsonify({'inserted': inserted, 'updated': updated})
+
+@app.route('/api/menu/availability', methods=['POST'])
+@admin_required
+def set_menu_availability():
+    data = request.get_json(silent=True) or {}
+    try:
+        ids = [int(item_id) for item_id in data.get('ids', [])]
+        available = _parse_bool(data['available'])
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'error': 'Send {"ids": [...], "available": true|false}'}), 400
+    if not ids:
+        return jsonify({'error': 'No menu items given'}), 400
+
+    result = db.session.execute(
+        db.update(MenuItem)
+        .where(MenuItem.id.in_(ids), MenuItem.available != available)
+        .values(available=available)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount:
+        db.session.info['menu_changed'] = True
+    db.session.commit()
+    return jsonify({'updated': result.rowcount})
+
+@app.route('/api/menu/export')
+@login_required
+def export_menu():
+    # The whole catalog, unavailable items included, in the import format
+    items = db.session.execute(
+        db.select(*(getattr(MenuItem, column) for column in MENU_EXPORT_COLUMNS))
+        .order_by(MenuItem.category, MenuItem.id)
+    ).all()
+    if request.args.get('format') == 'json':
+        return jsonify({'items': [dict(zip(MENU_EXPORT_COLUMNS, item)) for item in items]})
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(MENU_EXPORT_COLUMNS)
+    writer.writerows([_csv_safe(value) for value in item] for item in items)
+    response = Response(buffer.getvalue(), mimetype='text/csv')
+    response.headers['Content-Disposition'] = 'attachment; filename=menu.csv'
+    return response
+
+@app.route('/metrics')
+def metrics():
+    token = app.config['METRICS_TOKEN']
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        abort(401)
+    return Response(render_metrics(), mimetype=CONTENT_TYPE_LATEST)
+
+@app.cli.command('order-intake-worker')
+@click.option('--consumer', default=lambda: f'worker-{os.getpid()}', help='Consumer name within the group.')
+@click.option('--batch-size', default=ORDER_INTAKE_BATCH_SIZE, show_default=True)
+def order_intake_worker_command(consumer, batch_size):
+    """Drain the order intake stream, committing orders in batches."""
+    click.echo(f'Order intake worker {consumer} started')
+    run_order_intake_worker(consumer, batch_size)
+
+@app.cli.command('rebuild-rollups')
+def rebuild_rollups_command():
+    """Recompute the daily sales rollups from order history."""
+    with db.engine.begin() as connection:
+        rebuild_sales_rollups(connection)
+    click.echo('Sales rollups rebuilt')
+
+@app.cli.command('db-upgrade')
+def db_upgrade_command():
+    """Create missing tables and apply pending schema migrations."""
+    db.create_all()
+    run_migrations()
+    click.echo('Database schema is up to date')
+
+@app.cli.command('seed-menu')
+def seed_menu_command():
+    """Add the sample menu to an empty database."""
+    added = seed_menu()
+    click.echo(f'Added {added} menu items' if added else 'Menu already has items')
+
+@app.cli.command('db-explain')
+def db_explain_command():
+    """Check that the hot queries use their indexes (EXPLAIN)."""
+    missing = 0
+    for name, index_name, used, plan in explain_index_usage():
+        click.echo(f"{'ok  ' if used else 'MISS'} {name}: {index_name}")
+        if not used:
+            missing += 1
+            click.echo('     ' + plan.replace('\n', '\n     '))
+    if missing:
+        raise SystemExit(1)
+
+@app.cli.command('qr-codes')
+@click.option('--tables', default=20, show_default=True, help='Render tables 1..N.')
+@click.option('--size', default=QR_DEFAULT_BOX_SIZE, show_default=True, help='Pixels per QR module.')
+@click.option('--base-url', default=lambda: os.environ.get('PUBLIC_BASE_URL', 'http://localhost:5000'),
+              help='Public URL the codes point to (default: $PUBLIC_BASE_URL).')
+@click.option('--output', default='table_qr_codes.zip', show_default=True, help='.zip or .pdf file to write.')
+def qr_codes_command(tables, size, base_url, output):
+    """Render printable QR codes for every table."""
+    with app.test_request_context():
+        table_urls = {table: table_menu_url(table, base_url) for table in range(1, tables + 1)}
+
+    build = build_qr_pdf if output.endswith('.pdf') else build_qr_zip
+    with open(output, 'wb') as f:
+        f.write(build(table_urls, size))
+    click.echo(f'Wrote {tables} QR codes to {output}')
+
+@app.cli.command('menu-images')
+def menu_images_command():
+    """Pre-build responsive variants for every menu item photo."""
+    with app.test_request_context():
+        for item in MenuItem.query.filter(MenuItem.image_url.isnot(None)).all():
+            image = get_menu_image(item.image_url)
+            click.echo(f"{item.name}: {'ok' if image else 'skipped'}")
+
+@app.cli.command('build-assets')
+def build_assets_command():
+    """Fingerprint and precompress static files into static/dist."""
+    manifest = build_assets()
+    if not brotli:
+        click.echo('brotli is not installed; only gzip variants were written')
+    click.echo(f'Built {len(manifest)} assets into {ASSET_DIST_DIR}')
+
 if __name__ == '__main__':
-    init_db()
+    init_db()  # schema only; run `flask --app app seed-menu` for sample data
     port = int(os.environ.get('PORT', 5000))
     if os.environ.get('FLASK_ENV') == 'production':
         app.run(host='0.0.0.0', port=port)
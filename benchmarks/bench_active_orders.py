@@ -0,0 +1,74 @@
+"""Query count and latency of /api/active_orders as open orders grow.
+
+The endpoint eager-loads order items and their menu items, so the number of
+statements per request must not depend on how many orders are open. The
+script exits non-zero if it does.
+
+Usage:
+    python benchmarks/bench_active_orders.py [--rounds 20] [--open 1,10,40,200]
+"""
+import argparse
+import statistics
+import sys
+import time
+
+from common import StatementCounter, login_admin, percentile, use_cookie_sessions
+
+from app import app, db, init_db, MenuItem, Order, OrderItem
+
+
+def open_orders(count, menu_ids):
+    with app.app_context():
+        existing = Order.query.filter(Order.status.in_(['pending', 'confirmed'])).count()
+        for n in range(existing, count):
+            order = Order(table_number=1 + n % 20, status='pending' if n % 2 else 'confirmed')
+            for line in range(3):
+                order.items.append(OrderItem(
+                    menu_item_id=menu_ids[(n + line) % len(menu_ids)],
+                    quantity=1,
+                    price_at_time=5.0
+                ))
+            order.total_amount = 15.0
+            db.session.add(order)
+        db.session.commit()
+
+
+def run(rounds, sizes):
+    use_cookie_sessions(app)
+    init_db(seed=True)
+    client = app.test_client()
+    login_admin(client)
+    with app.app_context():
+        menu_ids = [item.id for item in MenuItem.query.all()]
+        counter = StatementCounter(db.engine)
+    # The first request after login fills the user cache; don't count it
+    client.get('/api/active_orders')
+
+    print(f"{'open':>6} {'stmts/req':>10} {'p50 ms':>8} {'p95 ms':>8}")
+    statement_counts = set()
+    for size in sorted(sizes):
+        open_orders(size, menu_ids)
+        timings = []
+        for _ in range(rounds):
+            start_count = counter.count
+            start = time.perf_counter()
+            response = client.get('/api/active_orders')
+            timings.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200
+            assert len(response.get_json()) == size
+            statement_counts.add(counter.count - start_count)
+        timings.sort()
+        print(f"{size:>6} {counter.count - start_count:>10} "
+              f"{statistics.median(timings):>8.2f} {percentile(timings, 0.95):>8.2f}")
+
+    if len(statement_counts) != 1:
+        print(f"FAIL: statement count varies with open orders: {sorted(statement_counts)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--open', default='1,10,40,200')
+    args = parser.parse_args()
+    run(args.rounds, [int(size) for size in args.open.split(',')])
@@ -0,0 +1,99 @@
+"""Concurrent order writes per database engine profile.
+
+Runs the same burst of /api/place_order calls from many threads twice, each
+in a fresh process: once with SQLAlchemy's defaults (DB_TUNING=off) and once
+with the backend tuning from app.py (SQLite WAL/busy_timeout/synchronous,
+Postgres pool sizing, pre-ping and statement timeout). Reports throughput,
+latency and failed writes such as "database is locked".
+
+Usage:
+    python benchmarks/bench_concurrent_writes.py [--threads 16] [--orders 50]
+    BENCH_DATABASE_URL=postgresql://localhost/jch_bench python benchmarks/bench_concurrent_writes.py
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+PROFILES = [('default', 'off'), ('tuned', 'on')]
+
+
+def run_child(threads, orders_per_thread):
+    from common import percentile, use_cookie_sessions
+
+    from app import app, init_db, MenuItem
+
+    use_cookie_sessions(app)
+    init_db(seed=True)
+    with app.app_context():
+        menu_ids = [item.id for item in MenuItem.query.all()]
+
+    timings = []
+    errors = []
+    lock = threading.Lock()
+
+    def writer(worker_id):
+        client = app.test_client()
+        for n in range(orders_per_thread):
+            items = [{'id': menu_ids[(worker_id + n + line) % len(menu_ids)], 'quantity': 1} for line in range(4)]
+            start = time.perf_counter()
+            try:
+                response = client.post('/api/place_order', json={'table_number': worker_id, 'items': items})
+                ok = response.status_code == 201
+                error = None if ok else response.status_code
+            except Exception as e:
+                ok, error = False, type(e).__name__
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                timings.append(elapsed)
+                if not ok:
+                    errors.append(str(error))
+
+    workers = [threading.Thread(target=writer, args=(n,)) for n in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    duration = time.perf_counter() - started
+
+    timings.sort()
+    print(json.dumps({
+        'orders': len(timings),
+        'errors': len(errors),
+        'throughput': len(timings) / duration,
+        'p50': percentile(timings, 0.50),
+        'p95': percentile(timings, 0.95),
+        'p99': percentile(timings, 0.99),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--orders', type=int, default=50, help='orders per thread')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.threads, args.orders)
+        return
+
+    print(f"{'profile':<9} {'orders':>7} {'errors':>7} {'orders/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, tuning in PROFILES:
+        # A fresh process per profile: engine options are fixed at import
+        output = subprocess.run(
+            [sys.executable, __file__, '--child', '--threads', str(args.threads), '--orders', str(args.orders)],
+            env={**os.environ, 'DB_TUNING': tuning},
+            capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{name:<9} {result['orders']:>7} {result['errors']:>7} {result['throughput']:>9.1f} "
+              f"{result['p50']:>8.2f} {result['p95']:>8.2f} {result['p99']:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""Worker boot cost: how long `import app` takes in a fresh interpreter.
+
+Each run imports the app in a new process (as a gunicorn worker without
+preload does), then times the first /generate_qr request, which pays for the
+lazily imported QR/Pillow modules, and a second one that doesn't. Also lists
+the app's slowest direct imports from `python -X importtime` and fails if a
+module meant to load lazily is imported at boot.
+
+Usage:
+    python benchmarks/bench_import_time.py [--runs 5] [--top 10] [--max-ms 1500]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Only needed by rarely used routes, so they must not load at import
+LAZY_MODULES = ['qrcode', 'PIL.Image', 'openpyxl', 'flask_talisman',
+                'concurrent.futures.process', 'sqlalchemy.dialects.postgresql']
+
+
+def run_child():
+    sys.path.insert(0, ROOT)
+    started = time.perf_counter()
+    import app as appmod
+    import_ms = (time.perf_counter() - started) * 1000
+    loaded = [name for name in LAZY_MODULES if name in sys.modules]
+
+    from common import use_cookie_sessions
+
+    use_cookie_sessions(appmod.app)
+    appmod.QR_CACHE_DIR = tempfile.mkdtemp(prefix='jch_qr_')
+    client = appmod.app.test_client()
+    timings = []
+    for table in (1, 2):
+        started = time.perf_counter()
+        response = client.get(f'/generate_qr/{table}')
+        assert response.status_code == 200, response.status_code
+        timings.append((time.perf_counter() - started) * 1000)
+
+    print(json.dumps({'import_ms': import_ms, 'loaded': loaded,
+                      'first_qr_ms': timings[0], 'next_qr_ms': timings[1]}))
+
+
+def child_env():
+    db_dir = tempfile.mkdtemp(prefix='jch_bench_')
+    return {**os.environ,
+            'DATABASE_URL': 'sqlite:///' + os.path.join(db_dir, 'bench.db'),
+            'RATE_LIMITS': 'off'}
+
+
+def slowest_imports(top):
+    # Direct imports of app.py by cumulative time, from -X importtime
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'],
+                            cwd=ROOT, env=child_env(), capture_output=True, text=True, check=True).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Children are listed before their parent: top-level modules are
+        # indented by one space, the modules they import by three
+        depth = len(name) - len(name.lstrip())
+        if depth == 3:
+            rows.append((int(cumulative) / 1000, name.strip()))
+        elif depth == 1:
+            if name.strip() == 'app':
+                return sorted(rows, reverse=True)[:top]
+            rows = []
+    return []
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help='slowest direct imports to list')
+    parser.add_argument('--max-ms', type=float, help='exit 1 if the median import time is above this')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child()
+        return
+
+    results = []
+    for _ in range(args.runs):
+        output = subprocess.run([sys.executable, __file__, '--child'], env=child_env(),
+                                capture_output=True, text=True, check=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    import_ms = sorted(result['import_ms'] for result in results)
+    print(f"import app        median {statistics.median(import_ms):8.1f} ms   max {import_ms[-1]:8.1f} ms")
+    print(f"first /generate_qr median {statistics.median(r['first_qr_ms'] for r in results):8.1f} ms")
+    print(f"next /generate_qr  median {statistics.median(r['next_qr_ms'] for r in results):8.1f} ms")
+
+    print("\nslowest imports (cumulative ms)")
+    for cumulative_ms, name in slowest_imports(args.top):
+        print(f"  {cumulative_ms:8.1f}  {name}")
+
+    failed = False
+    loaded = sorted({name for result in results for name in result['loaded']})
+    if loaded:
+        print(f"\nFAIL: loaded at import but should be lazy: {', '.join(loaded)}")
+        failed = True
+    if args.max_ms is not None and statistics.median(import_ms) > args.max_ms:
+        print(f"\nFAIL: median import time above {args.max_ms:.0f} ms")
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Round trips and latency of /api/place_order per order size.
+
+Compares the original per-line implementation (one ``MenuItem`` lookup and
+one ``OrderItem`` insert per line) against the current endpoint, which
+resolves all items with one IN query and writes them in a single bulk insert.
+
+Usage:
+    python benchmarks/bench_place_order.py [--rounds 50] [--sizes 1,4,12,24]
+"""
+import argparse
+import statistics
+import time
+
+from common import StatementCounter, percentile, use_cookie_sessions
+
+from app import app, db, init_db, MenuItem, Order, OrderItem
+
+
+def legacy_place_order(table_number, items):
+    # The pre-batching implementation, kept here as the baseline
+    order = Order(table_number=table_number)
+    total_amount = 0
+    for item in items:
+        menu_item = db.session.get(MenuItem, item['id'])
+        if not menu_item:
+            continue
+        order_item = OrderItem(
+            menu_item_id=menu_item.id,
+            quantity=item['quantity'],
+            price_at_time=menu_item.price,
+            special_instructions=item.get('special_instructions', '')
+        )
+        total_amount += menu_item.price * item['quantity']
+        order.items.append(order_item)
+    order.total_amount = total_amount
+    db.session.add(order)
+    db.session.commit()
+    return order.id
+
+
+def make_items(menu_ids, size):
+    return [{
+        'id': menu_ids[i % len(menu_ids)],
+        'quantity': 1 + i % 3,
+        'special_instructions': ''
+    } for i in range(size)]
+
+
+def run(rounds, sizes):
+    use_cookie_sessions(app)
+    init_db(seed=True)
+    client = app.test_client()
+    with app.app_context():
+        menu_ids = [item.id for item in MenuItem.query.all()]
+        counter = StatementCounter(db.engine)
+
+    print(f"{'size':>5} {'variant':>8} {'stmts/order':>12} {'p50 ms':>8} {'p95 ms':>8}")
+    for size in sizes:
+        items = make_items(menu_ids, size)
+        for variant in ('before', 'after'):
+            timings = []
+            statements = []
+            for _ in range(rounds):
+                start_count = counter.count
+                start = time.perf_counter()
+                if variant == 'before':
+                    with app.app_context():
+                        legacy_place_order(1, items)
+                else:
+                    response = client.post('/api/place_order', json={'table_number': 1, 'items': items})
+                    assert response.status_code == 201, response.get_data(as_text=True)
+                timings.append((time.perf_counter() - start) * 1000)
+                statements.append(counter.count - start_count)
+            timings.sort()
+            print(f"{size:>5} {variant:>8} {statistics.mean(statements):>12.1f} "
+                  f"{statistics.median(timings):>8.2f} {percentile(timings, 0.95):>8.2f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=50)
+    parser.add_argument('--sizes', default='1,4,12,24')
+    args = parser.parse_args()
+    run(args.rounds, [int(size) for size in args.sizes.split(',')])
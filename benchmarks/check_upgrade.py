@@ -0,0 +1,116 @@
+"""Upgrade check: migrate a database created by the original app.py.
+
+Builds the schema the app shipped with before any migrations existed (the
+four original tables, no indexes beyond the unique constraints), adds a few
+rows, then runs the migrations the way `flask db-upgrade` does. Fails if a
+migration errors, if the result is missing any column or index the models
+expect, or if a second run isn't a no-op.
+
+Usage:
+    python benchmarks/check_upgrade.py
+    BENCH_DATABASE_URL=postgresql://localhost/jch_upgrade python benchmarks/check_upgrade.py
+"""
+import os
+import sys
+from datetime import datetime
+
+import common  # noqa: F401  (points DATABASE_URL at a throwaway database; must come before app)
+from sqlalchemy import (Boolean, Column, DateTime, Float, ForeignKey, Integer, MetaData, String, Table,
+                        Text, create_engine, inspect)
+
+baseline = MetaData()
+Table('user', baseline,
+      Column('id', Integer, primary_key=True),
+      Column('username', String(80), unique=True, nullable=False),
+      Column('email', String(120), unique=True, nullable=False),
+      Column('password_hash', String(120), nullable=False))
+Table('menu_item', baseline,
+      Column('id', Integer, primary_key=True),
+      Column('name', String(100), nullable=False),
+      Column('description', Text),
+      Column('price', Float, nullable=False),
+      Column('category', String(50), nullable=False),
+      Column('image_url', String(200)),
+      Column('available', Boolean))
+Table('order', baseline,
+      Column('id', Integer, primary_key=True),
+      Column('user_id', Integer, ForeignKey('user.id')),
+      Column('table_number', Integer),
+      Column('status', String(20)),
+      Column('created_at', DateTime),
+      Column('total_amount', Float, nullable=False))
+Table('order_item', baseline,
+      Column('id', Integer, primary_key=True),
+      Column('order_id', Integer, ForeignKey('order.id'), nullable=False),
+      Column('menu_item_id', Integer, ForeignKey('menu_item.id'), nullable=False),
+      Column('quantity', Integer, nullable=False),
+      Column('price_at_time', Float, nullable=False),
+      Column('special_instructions', Text))
+
+
+def create_baseline(url):
+    engine = create_engine(url)
+    baseline.drop_all(engine)
+    baseline.create_all(engine)
+    tables = baseline.tables
+    with engine.begin() as connection:
+        connection.execute(tables['menu_item'].insert(), [
+            {'id': 1, 'name': 'Samosa', 'price': 6.99, 'category': 'Appetizer', 'available': True},
+            {'id': 2, 'name': 'Mango Lassi', 'price': 4.99, 'category': 'Beverage', 'available': True},
+        ])
+        connection.execute(tables['order'].insert(), [
+            {'id': 1, 'table_number': 3, 'status': 'completed', 'created_at': datetime(2024, 1, 5, 19), 'total_amount': 18.97},
+            {'id': 2, 'table_number': None, 'status': 'pending', 'created_at': datetime(2024, 1, 6, 12), 'total_amount': 4.99},
+        ])
+        connection.execute(tables['order_item'].insert(), [
+            {'order_id': 1, 'menu_item_id': 1, 'quantity': 2, 'price_at_time': 6.99},
+            {'order_id': 1, 'menu_item_id': 2, 'quantity': 1, 'price_at_time': 4.99},
+            {'order_id': 2, 'menu_item_id': 2, 'quantity': 1, 'price_at_time': 4.99},
+        ])
+    engine.dispose()
+
+
+def main():
+    create_baseline(os.environ['DATABASE_URL'])
+
+    from app import app, db, DailyTableSales, MIGRATIONS, run_migrations
+
+    problems = []
+    with app.app_context():
+        # Same steps as `flask db-upgrade`
+        db.create_all()
+        run_migrations()
+
+        inspector = inspect(db.engine)
+        for table in db.metadata.sorted_tables:
+            columns = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in columns:
+                    problems.append(f'missing column {table.name}.{column.name}')
+            indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    problems.append(f'missing index {index.name}')
+
+        with db.engine.connect() as connection:
+            applied = set(connection.exec_driver_sql('SELECT version FROM schema_migrations').scalars())
+        for version, description, _ in MIGRATIONS:
+            if version not in applied:
+                problems.append(f'migration {version} ({description}) not recorded')
+
+        revenue = db.session.query(db.func.sum(DailyTableSales.revenue)).scalar()
+        if revenue is None or round(revenue, 2) != 18.97:
+            problems.append(f'rollups not backfilled from existing orders (revenue {revenue})')
+
+        # A second run must find nothing to do (and not fail)
+        run_migrations()
+
+    for problem in problems:
+        print(f'FAIL: {problem}')
+    if problems:
+        sys.exit(1)
+    print(f'ok: upgraded a baseline database through {len(MIGRATIONS)} migrations')
+
+
+if __name__ == '__main__':
+    main()
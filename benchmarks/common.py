@@ -0,0 +1,64 @@
+"""Shared setup for the benchmark scripts.
+
+Importing this module points the app at a throwaway SQLite database (or
+``BENCH_DATABASE_URL``) and, unless ``REDIS_URL`` is set, at an in-memory
+Redis stand-in, so it must be imported before ``app``.
+"""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+if 'BENCH_DATABASE_URL' in os.environ:
+    os.environ['DATABASE_URL'] = os.environ['BENCH_DATABASE_URL']
+else:
+    _db_dir = tempfile.mkdtemp(prefix='jch_bench_')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_db_dir, 'bench.db')
+
+# Without REDIS_URL, run against an in-memory Redis stand-in when fakeredis
+# is installed (pip install -r benchmarks/requirements.txt)
+if 'REDIS_URL' not in os.environ:
+    try:
+        import fakeredis
+        import redis
+
+        _fake_redis_server = fakeredis.FakeServer()
+        redis.from_url = lambda *args, **kwargs: fakeredis.FakeRedis(server=_fake_redis_server)
+    except ImportError:
+        pass
+
+# Load scripts drive every request from one address; keep the limiter out of
+# the measurements unless RATE_LIMITS is set explicitly
+os.environ.setdefault('RATE_LIMITS', 'off')
+
+from flask.sessions import SecureCookieSessionInterface  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+
+class StatementCounter:
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+def use_cookie_sessions(app):
+    # Only database work is measured, so keep sessions out of Redis
+    app.session_interface = SecureCookieSessionInterface()
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def login_admin(client, username='bench-admin', password='bench-password'):
+    client.post('/register', data={
+        'username': username,
+        'email': f'{username}@example.com',
+        'password': password
+    })
+    client.post('/login', data={'username': username, 'password': password})
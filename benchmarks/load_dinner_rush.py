@@ -0,0 +1,286 @@
+"""Dinner-rush load test for the Flask app.
+
+Seeds a realistic menu and order history, then replays a mix of diners and
+staff from concurrent threads for a fixed duration:
+
+- QR menu scans (phones revalidate with If-None-Match about half the time)
+- /api/place_order bursts of 1-8 lines
+- admin polling of /api/active_orders with a since cursor
+- order status updates
+
+Throughput and p50/p95/p99 latency are reported per route. By default the
+app runs in-process; pass --url to drive a running server instead (point
+BENCH_DATABASE_URL at the server's database so seeding lands in the same
+place). Use --save to keep results and --compare to fail on a p95 regression.
+
+Usage:
+    pip install -r benchmarks/requirements.txt
+    python benchmarks/load_dinner_rush.py [--duration 30] [--threads 8]
+    BENCH_DATABASE_URL=postgresql://localhost/jch_bench REDIS_URL=redis://localhost:6379 \\
+        python benchmarks/load_dinner_rush.py --url http://localhost:5000
+"""
+import argparse
+import http.cookiejar
+import json
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from common import percentile
+
+from app import app, db, init_db, MenuItem, Order, OrderItem
+
+CATEGORIES = ['Appetizer', 'Main Course', 'Bread', 'Dessert', 'Beverage']
+STATUSES = ['pending', 'confirmed', 'completed', 'cancelled']
+TABLES = 30
+
+# Relative weight of each scenario in the replayed mix
+MIX = [
+    ('qr_scan', 50),
+    ('place_order', 20),
+    ('admin_poll', 20),
+    ('status_update', 10),
+]
+
+
+class InProcessClient:
+    def __init__(self):
+        self.client = app.test_client()
+
+    def request(self, method, path, headers=None, json_body=None, form=None):
+        response = self.client.open(path, method=method, headers=headers or {}, json=json_body, data=form)
+        return response.status_code, response.headers, response.get_json(silent=True)
+
+
+class HttpClient:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def request(self, method, path, headers=None, json_body=None, form=None):
+        headers = dict(headers or {})
+        data = None
+        if json_body is not None:
+            data = json.dumps(json_body).encode()
+            headers['Content-Type'] = 'application/json'
+        elif form is not None:
+            data = urllib.parse.urlencode(form).encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        req = urllib.request.Request(self.base_url + path, data=data, headers=headers, method=method)
+        try:
+            with self.opener.open(req) as response:
+                body = response.read()
+                status, response_headers = response.status, response.headers
+        except urllib.error.HTTPError as e:
+            body, status, response_headers = e.read(), e.code, e.headers
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            payload = None
+        return status, response_headers, payload
+
+
+def seed(menu_size, history_orders):
+    init_db(seed=True)
+    with app.app_context():
+        existing = MenuItem.query.count()
+        if existing < menu_size:
+            db.session.execute(db.insert(MenuItem), [{
+                'name': f'Dish {n}',
+                'description': 'Slow-cooked with whole spices, finished with cream and coriander',
+                'price': round(4 + (n * 37 % 1800) / 100, 2),
+                'category': CATEGORIES[n % len(CATEGORIES)],
+                'available': n % 10 != 0
+            } for n in range(existing, menu_size)])
+            db.session.commit()
+
+        menu = [(item.id, item.price) for item in MenuItem.query.filter_by(available=True)]
+        rng = random.Random(42)
+        start = datetime.utcnow() - timedelta(days=90)
+        # History in chunks so seeding stays fast on a remote database
+        for chunk_start in range(0, history_orders, 500):
+            orders = []
+            order_lines = []
+            for n in range(chunk_start, min(chunk_start + 500, history_orders)):
+                created_at = start + timedelta(minutes=n * 90 * 24 * 60 // max(history_orders, 1))
+                lines = [(item_id, price, rng.randint(1, 3)) for item_id, price in rng.sample(menu, rng.randint(1, 5))]
+                # Totals are set up front: a later UPDATE would bump updated_at to now
+                orders.append(Order(
+                    table_number=rng.randint(1, TABLES),
+                    status=rng.choice(STATUSES[2:]) if n < history_orders - 20 else 'pending',
+                    created_at=created_at,
+                    updated_at=created_at,
+                    total_amount=sum(price * quantity for _, price, quantity in lines)
+                ))
+                order_lines.append(lines)
+            db.session.add_all(orders)
+            db.session.flush()
+            db.session.execute(db.insert(OrderItem), [{
+                'order_id': order.id,
+                'menu_item_id': item_id,
+                'quantity': quantity,
+                'price_at_time': price
+            } for order, lines in zip(orders, order_lines) for item_id, price, quantity in lines])
+            db.session.commit()
+        return [item_id for item_id, _ in menu]
+
+
+class Diner:
+    def __init__(self, client, menu_ids, rng):
+        self.client = client
+        self.menu_ids = menu_ids
+        self.rng = rng
+        self.etags = {}
+
+    def qr_scan(self):
+        table = self.rng.randint(1, TABLES)
+        headers = {}
+        if table in self.etags and self.rng.random() < 0.5:
+            headers['If-None-Match'] = self.etags[table]
+        status, response_headers, _ = self.client.request('GET', f'/qr/{table}', headers=headers)
+        if response_headers.get('ETag'):
+            self.etags[table] = response_headers['ETag']
+        return status in (200, 304)
+
+    def place_order(self):
+        lines = self.rng.sample(self.menu_ids, self.rng.randint(1, min(8, len(self.menu_ids))))
+        status, _, _ = self.client.request('POST', '/api/place_order', json_body={
+            'table_number': self.rng.randint(1, TABLES),
+            'items': [{'id': item_id, 'quantity': self.rng.randint(1, 3)} for item_id in lines]
+        })
+        return status in (201, 202)
+
+
+class Staff:
+    def __init__(self, client, rng, name):
+        self.client = client
+        self.rng = rng
+        self.cursor = ''
+        self.order_ids = []
+        credentials = {'username': name, 'password': 'bench-password'}
+        client.request('POST', '/register', form={**credentials, 'email': f'{name}@example.com'})
+        client.request('POST', '/login', form=credentials)
+
+    def admin_poll(self):
+        status, _, payload = self.client.request('GET', f'/api/active_orders?since={self.cursor}')
+        if status != 200 or payload is None:
+            return False
+        self.cursor = payload['cursor']
+        self.order_ids = ([order['id'] for order in payload['orders']] + self.order_ids)[:50]
+        return True
+
+    def status_update(self):
+        if not self.order_ids:
+            return self.admin_poll()
+        order_id = self.rng.choice(self.order_ids)
+        status, _, _ = self.client.request('POST', f'/api/update_order_status/{order_id}',
+                                           json_body={'status': self.rng.choice(STATUSES[1:])})
+        return status == 200
+
+
+def run_worker(worker_id, make_client, menu_ids, deadline, results):
+    rng = random.Random(worker_id)
+    diner = Diner(make_client(), menu_ids, rng)
+    staff = Staff(make_client(), rng, f'bench-staff-{worker_id}')
+    scenarios = {
+        'qr_scan': diner.qr_scan,
+        'place_order': diner.place_order,
+        'admin_poll': staff.admin_poll,
+        'status_update': staff.status_update,
+    }
+    names = [name for name, _ in MIX]
+    weights = [weight for _, weight in MIX]
+    while time.monotonic() < deadline:
+        name = rng.choices(names, weights)[0]
+        start = time.perf_counter()
+        try:
+            ok = scenarios[name]()
+        except Exception:
+            ok = False
+        results[name].append(((time.perf_counter() - start) * 1000, ok))
+
+
+def report(results, duration):
+    summary = {}
+    print(f"{'route':<15} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, _ in MIX:
+        samples = results.get(name, [])
+        if not samples:
+            continue
+        timings = sorted(elapsed for elapsed, _ in samples)
+        stats = {
+            'requests': len(samples),
+            'errors': sum(1 for _, ok in samples if not ok),
+            'throughput': len(samples) / duration,
+            'p50': percentile(timings, 0.50),
+            'p95': percentile(timings, 0.95),
+            'p99': percentile(timings, 0.99),
+        }
+        summary[name] = stats
+        print(f"{name:<15} {stats['requests']:>9} {stats['errors']:>7} {stats['throughput']:>8.1f} "
+              f"{stats['p50']:>8.2f} {stats['p95']:>8.2f} {stats['p99']:>8.2f}")
+    return summary
+
+
+def compare(summary, baseline, tolerance):
+    regressions = []
+    for name, stats in summary.items():
+        if name in baseline and stats['p95'] > baseline[name]['p95'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {stats['p95']:.2f} ms vs baseline {baseline[name]['p95']:.2f} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--duration', type=float, default=30, help='seconds to replay the mix')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--menu-size', type=int, default=48)
+    parser.add_argument('--history', type=int, default=5000, help='past orders to seed')
+    parser.add_argument('--url', help='drive a running server instead of the in-process app')
+    parser.add_argument('--save', help='write the per-route results to this JSON file')
+    parser.add_argument('--compare', help='baseline JSON from --save; exit 1 on a p95 regression')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed p95 slowdown (0.25 = 25%%)')
+    args = parser.parse_args()
+
+    print(f"Seeding {args.menu_size} menu items and {args.history} past orders...")
+    menu_ids = seed(args.menu_size, args.history)
+
+    if args.url:
+        def make_client():
+            return HttpClient(args.url)
+    else:
+        make_client = InProcessClient
+
+    results = defaultdict(list)
+    deadline = time.monotonic() + args.duration
+    threads = [
+        threading.Thread(target=run_worker, args=(n, make_client, menu_ids, deadline, results))
+        for n in range(args.threads)
+    ]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    summary = report(results, time.monotonic() - started)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(summary, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(summary, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
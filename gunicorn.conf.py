@@ -0,0 +1,70 @@
+# Gunicorn configuration for the web process (see Procfile).
+#
+# Workers and threads are sized from the CPU count unless WEB_CONCURRENCY /
+# GUNICORN_THREADS are set. The default gthread worker lets each process serve
+# several table orders (and held SSE streams) at once; set
+# GUNICORN_WORKER_CLASS=gevent (pip install gevent psycogreen) for many more
+# concurrent connections per worker.
+import multiprocessing
+import os
+import shutil
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+# cpu_count() reports the host's CPUs inside a container, so the default is
+# capped; set WEB_CONCURRENCY to suit the instance and the database's
+# connection limit (see README)
+cpus = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else multiprocessing.cpu_count()
+workers = int(os.environ.get('WEB_CONCURRENCY', min(cpus * 2 + 1, int(os.environ.get('GUNICORN_MAX_WORKERS', 8)))))
+threads = int(os.environ.get('GUNICORN_THREADS', 4 if worker_class == 'gthread' else 1))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+
+# The app sizes its database pool from these (one connection per thread, or
+# a capped pool shared by a gevent worker's greenlets)
+os.environ.setdefault('GUNICORN_WORKER_CLASS', worker_class)
+os.environ.setdefault('GUNICORN_THREADS', str(threads))
+os.environ.setdefault('GUNICORN_WORKER_CONNECTIONS', str(worker_connections))
+
+# Import the app once in the master so workers fork with it already loaded.
+# gevent must patch sockets before redis and psycopg2 are imported, so it
+# loads the app in each worker instead.
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'off' if worker_class == 'gevent' else 'on') == 'on'
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers now and then to cap slow memory growth
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = max_requests // 10
+
+accesslog = '-'
+errorlog = '-'
+
+
+def on_starting(server):
+    # Start with a clean Prometheus multiprocess directory
+    metrics_dir = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if metrics_dir:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+        os.makedirs(metrics_dir, exist_ok=True)
+
+
+def post_fork(server, worker):
+    if worker_class == 'gevent':
+        try:
+            from psycogreen.gevent import patch_psycopg
+            patch_psycopg()
+        except ImportError:
+            server.log.warning('psycogreen not installed: psycopg2 calls will block the gevent loop')
+
+    if preload_app:
+        from app import reset_connections_after_fork
+        reset_connections_after_fork()
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,50 @@
+// Order submission shared by the menu and table (QR) pages.
+//
+// Every attempt at the same order carries the same Idempotency-Key, so a
+// retry after a timeout can't place the order twice. Call orderSubmitted()
+// once an order goes through so the next one gets a fresh key.
+let pendingOrder = null;
+
+function newOrderKey() {
+    if (window.crypto && crypto.randomUUID) {
+        return crypto.randomUUID();
+    }
+    return Date.now().toString(36) + Math.random().toString(36).slice(2);
+}
+
+function orderSubmitted() {
+    pendingOrder = null;
+}
+
+async function submitOrder(payload, attempts = 3) {
+    const body = JSON.stringify(payload);
+    if (!pendingOrder || pendingOrder.body !== body) {
+        pendingOrder = { body: body, key: newOrderKey() };
+    }
+    for (let attempt = 1; ; attempt++) {
+        const controller = new AbortController();
+        const timer = setTimeout(() => controller.abort(), 10000);
+        try {
+            const response = await fetch('/api/place_order', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'Idempotency-Key': pendingOrder.key
+                },
+                body: body,
+                signal: controller.signal
+            });
+            // 409: the first attempt is still being processed
+            if (response.status !== 409 || attempt === attempts) {
+                return response;
+            }
+        } catch (error) {
+            if (attempt === attempts) {
+                throw error;
+            }
+        } finally {
+            clearTimeout(timer);
+        }
+        await new Promise(resolve => setTimeout(resolve, 1000 * attempt));
+    }
+}